@@ -14,6 +14,9 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/xinetzone/pygui",
     packages=setuptools.find_packages(),
+    entry_points={
+        'console_scripts': ['tkinterx=tkinterx.cli:main'],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "Development Status :: 2 - Pre-Alpha",
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from tkinterx.graph.boxes import BoxArray
+from tkinterx.graph.shapes import bunch2params
+
+
+def random_boxes(n, seed=0, size=1000):
+    rng = np.random.default_rng(seed)
+    x0, y0 = rng.uniform(0, size, (2, n))
+    w, h = rng.exponential(size / 20, (2, n))
+    # Some large boxes and some copies
+    w[::17] *= 30
+    coords = np.stack([x0, y0, x0 + w, y0 + h], axis=1)
+    coords[5::23] = coords[4::23][:len(coords[5::23])]
+    labels = np.stack([rng.integers(0, 3, n), np.zeros(n, dtype=int)], axis=1)
+    return BoxArray(coords, labels, ['red', 'blue', 'green'], ['rectangle'])
+
+
+def brute_pairs(boxes):
+    c = boxes.normalized().coords
+    return {(i, j) for i in range(len(c)) for j in range(i+1, len(c))
+            if c[i, 0] <= c[j, 2] and c[j, 0] <= c[i, 2]
+            and c[i, 1] <= c[j, 3] and c[j, 1] <= c[i, 3]}
+
+
+def brute_dedup(boxes, threshold, by_color=True):
+    iou = boxes.iou()
+    kept = []
+    for p in range(len(boxes)):
+        if not any(iou[p, q] > threshold and (not by_color or boxes.labels[p, 0] == boxes.labels[q, 0])
+                   for q in kept):
+            kept.append(p)
+    return kept
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_overlapping_pairs_as_brute_force(seed):
+    boxes = random_boxes(300, seed)
+    i, j = boxes.overlapping_pairs()
+    assert set(zip(i.tolist(), j.tolist())) == brute_pairs(boxes)
+    assert len(set(zip(i.tolist(), j.tolist()))) == len(i)
+
+
+def test_overlapping_pairs_of_a_column():
+    # The same x range, no overlap: no pair, and not n**2 candidates
+    n = 2000
+    coords = [(0, 2 * k, 10, 2 * k + 1) for k in range(n)]
+    boxes = BoxArray(coords, [(0, 0)] * n, ['red'], ['rectangle'])
+    i, j = boxes.overlapping_pairs()
+    assert len(i) == 0
+
+
+def test_overlapping_pairs_touching_and_flipped():
+    boxes = BoxArray([(10, 10, 0, 0), (10, 0, 20, 10), (21, 0, 30, 10)], [(0, 0)] * 3,
+                     ['red'], ['rectangle'])
+    i, j = boxes.overlapping_pairs()
+    assert list(zip(i.tolist(), j.tolist())) == [(0, 1)]
+
+
+@pytest.mark.parametrize('threshold', [0.3, 0.9])
+@pytest.mark.parametrize('by_color', [True, False])
+def test_dedup_as_greedy_suppression(threshold, by_color):
+    boxes = random_boxes(300, 1)
+    kept = boxes.dedup(threshold, by_color)
+    expected = brute_dedup(boxes, threshold, by_color)
+    assert kept.ids == [boxes.ids[k] for k in expected]
+
+
+def test_dedup_of_many_copies():
+    boxes = BoxArray([(0, 0, 10, 10)] * 5000 + [(0, 0, 0, 0)] * 2, [(0, 0)] * 5002,
+                     ['red'], ['rectangle'])
+    assert boxes.dedup().ids == [1, 5001, 5002]
+
+
+def test_from_graph_keeps_the_bbox_of_polygons():
+    graph = {'1': {'tags': ['red', 'polygon'], 'bbox': [5, 8, 1, 2, 9, 4]},
+             '2': {'tags': ['blue', 'rectangle'], 'bbox': [0, 0, 10, 10]}}
+    boxes = BoxArray.from_graph(graph)
+    assert boxes.ids == ['1', '2']
+    assert boxes.to_graph()['1']['bbox'] == [1, 2, 9, 8]
+    assert boxes.to_graph()['2'] == graph['2']
+    assert list(boxes.iter_boxes('shape')) == [('polygon', 1, 2, 9, 8),
+                                               ('rectangle', 0, 0, 10, 10)]
+
+
+def test_bunch2params_of_the_boxes():
+    graph = {'1': {'tags': ['red', 'rectangle'], 'bbox': [0, 0, 10, 10]},
+             '2': {'tags': ['blue', 'oval_'], 'bbox': [1, 2, 3, 4]}}
+    params = bunch2params(BoxArray.from_graph(graph))
+    assert params == {k: {**v, 'tags': tuple(v['tags'])} for k, v in bunch2params(graph).items()}
+    assert params['2']['graph_type'] == 'oval'
@@ -0,0 +1,116 @@
+import json
+
+from PIL import Image
+import pytest
+
+from tkinterx.cli import main
+from tkinterx.convert import (export_coco, export_voc, export_yolo, import_coco,
+                              import_voc, import_yolo, make_graph)
+from tkinterx.store import open_store
+
+
+BOXES = {
+    'a.jpg': [('red', 10, 20, 110, 70), ('blue', 0, 0, 50, 50)],
+    'sub/b.png': [('red', 5, 5, 15, 25)],
+    'c.jpg': [],
+}
+
+
+@pytest.fixture
+def pictures(tmp_path):
+    root = tmp_path / 'pictures'
+    (root / 'sub').mkdir(parents=True)
+    for name in BOXES:
+        Image.new('RGB', (200, 100)).save(root / name)
+    return root
+
+
+@pytest.fixture
+def bunch(pictures):
+    bunch = {'root': pictures.as_posix()}
+    bunch.update((name, make_graph(boxes)) for name, boxes in BOXES.items())
+    return bunch
+
+
+def read_boxes(store):
+    return {name: sorted((cats['tags'][0], *cats['bbox']) for cats in store[name].values())
+            for name in store if name != 'root'}
+
+
+def assert_boxes(store, tolerance=0):
+    boxes = read_boxes(store)
+    for name, expected in BOXES.items():
+        if not expected:  # Not in the store of some formats
+            assert not boxes.get(name)
+            continue
+        for (label, *bbox), (expected_label, *expected_bbox) in zip(boxes[name], sorted(expected)):
+            assert label == expected_label
+            assert bbox == pytest.approx(expected_bbox, abs=tolerance)
+
+
+def test_coco_round_trip(tmp_path, bunch):
+    output = tmp_path / 'coco.json'
+    assert export_coco(bunch, bunch['root'], output, workers=1) == 3
+    coco = json.loads(output.read_text(encoding='utf-8'))
+    assert [image['file_name'] for image in coco['images']] == list(BOXES)
+    assert {c['name'] for c in coco['categories']} == {'red', 'blue'}
+    store = open_store(tmp_path / 'annotations.jsonl')
+    assert import_coco(output, store) == 3
+    assert_boxes(store)
+    store.close()
+
+
+def test_yolo_round_trip(tmp_path, bunch, pictures):
+    output = tmp_path / 'labels'
+    assert export_yolo(bunch, bunch['root'], output, workers=1) == 3
+    assert (output / 'sub' / 'b.txt').exists()
+    store = open_store(tmp_path / 'annotations.jsonl')
+    assert import_yolo(output, pictures, store, workers=1) == 3
+    assert_boxes(store, tolerance=1e-3)
+    store.close()
+
+
+def test_voc_round_trip(tmp_path, bunch):
+    output = tmp_path / 'voc'
+    assert export_voc(bunch, bunch['root'], output, workers=1) == 3
+    store = open_store(tmp_path / 'annotations.jsonl')
+    assert import_voc(output, store) == 3
+    assert_boxes(store)
+    store.close()
+
+
+@pytest.mark.parametrize('export', [export_coco, export_yolo, export_voc])
+def test_missing_pictures_are_skipped(tmp_path, bunch, export):
+    bunch['missing.jpg'] = make_graph([('red', 0, 0, 1, 1)])
+    skipped = []
+    output = tmp_path / ('coco.json' if export is export_coco else 'out')
+    assert export(bunch, bunch['root'], output, workers=1, skipped=skipped) == 3
+    assert skipped == ['missing.jpg']
+
+
+def test_coco_never_left_truncated(tmp_path, bunch):
+    bunch['sub/b.png'] = {'1': {'tags': ['red']}}  # No bbox
+    output = tmp_path / 'coco.json'
+    with pytest.raises(KeyError):
+        export_coco(bunch, bunch['root'], output, workers=1)
+    assert list(tmp_path.glob('coco.json*')) == []
+
+
+def test_cli_export_reports_the_skipped_records(tmp_path, bunch, capsys):
+    path = tmp_path / 'annotations.jsonl'
+    store = open_store(path)
+    store.update(bunch)
+    store['missing.jpg'] = make_graph([('red', 0, 0, 1, 1)])
+    store.close()
+    main(['export', 'coco', str(path), str(tmp_path / 'coco.json'), '--workers', '1'])
+    out = capsys.readouterr().out
+    assert 'Skipped 1 records' in out and 'export coco: 3 boxes' in out
+
+
+def test_polygons_are_exported_clipped(tmp_path, bunch):
+    bunch['c.jpg'] = {'1': {'tags': ['red', 'polygon'], 'bbox': [150, 50, 250, 20, 180, 90]}}
+    output = tmp_path / 'coco.json'
+    assert export_coco(bunch, bunch['root'], output, workers=1) == 4
+    coco = json.loads(output.read_text(encoding='utf-8'))
+    assert coco['annotations'][-1]['bbox'] == [150, 20, 50, 70]
+    assert all(type(v) is int for a in coco['annotations'] for v in a['bbox'])
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from tkinterx.frames import FrameStack
+
+
+@pytest.mark.parametrize('shape, mode', [((5, 6, 7), 'L'), ((5, 6, 7, 3), 'RGB'),
+                                         ((5, 6, 7, 4), 'RGBA'), ((6, 7, 3), 'RGB')])
+def test_npy_frames(tmp_path, shape, mode):
+    data = np.arange(np.prod(shape), dtype=np.uint8).reshape(shape)
+    path = tmp_path / 'frames.npy'
+    np.save(path, data)
+    frames = FrameStack(path)
+    if len(shape) == 3 and shape[2] == 3:  # One RGB frame
+        data = data[None]
+    assert len(frames) == len(data) and frames.info == (7, 6, mode)
+    for k in (0, len(data) - 1, -1):
+        assert np.array_equal(np.asarray(frames[k]), data[k])
+    with pytest.raises(IndexError):
+        frames[len(data)]
+    frames.close()
+
+
+@pytest.mark.parametrize('dtype', ['<u2', '>u2'])
+def test_raw_16_bits_show_the_high_byte(tmp_path, dtype):
+    data = (np.arange(3 * 2 * 5).reshape(3, 2, 5) * 1000).astype(dtype)
+    path = tmp_path / 'sensor.raw'
+    path.write_bytes(b'HEAD' + data.tobytes() + b'\0')  # A header and a torn frame
+    frames = FrameStack(path, shape=(2, 5), dtype=dtype, offset=4)
+    assert len(frames) == 3 and frames.info == (5, 2, 'L')
+    assert np.array_equal(np.asarray(frames[2]), (data[2] >> 8).astype(np.uint8))
+    frames.close()
+
+
+def test_frames_outlive_close(tmp_path):
+    np.save(tmp_path / 'frames.npy', np.full((2, 3, 5), 7, dtype=np.uint8))
+    frames = FrameStack(tmp_path / 'frames.npy')
+    image = frames[1]
+    frames.close()  # The mapping stays while the image uses it
+    assert image.getpixel((0, 0)) == 7
+
+
+def test_unsupported_frames(tmp_path):
+    np.save(tmp_path / 'frames.npy', np.zeros((2, 3, 5), dtype=np.float32))
+    with pytest.raises(ValueError, match='unsupported'):
+        FrameStack(tmp_path / 'frames.npy')
+    (tmp_path / 'empty.raw').write_bytes(b'\0' * 10)
+    with pytest.raises(ValueError, match='no frame'):
+        FrameStack(tmp_path / 'empty.raw', shape=(4, 4))
@@ -0,0 +1,96 @@
+import pytest
+
+from tkinterx.graph.history import History
+
+
+class FakeDrawing:
+    '''The part of a ScrollableDrawing used by History, without Tk.'''
+
+    def __init__(self):
+        self.zoom = 1
+        self.items = {}  # graph_id -> [tags, coords]
+        self._next_id = 1
+
+    @property
+    def model(self):
+        return self
+
+    def tags(self, graph_id):
+        return self.items[graph_id][0]
+
+    def __contains__(self, graph_id):
+        return graph_id in self.items
+
+    def draw_graphs(self, params):
+        graph_ids = []
+        for param in params:
+            self.items[self._next_id] = [tuple(param['tags']), tuple(param['direction'])]
+            graph_ids.append(self._next_id)
+            self._next_id += 1
+        return graph_ids
+
+    def coords(self, graph_id, *coords):
+        if coords:
+            self.items[graph_id][1] = tuple(coords)
+        return self.items[graph_id][1]
+
+    def move(self, graph_id, x, y):
+        x0, y0, x1, y1 = self.items[graph_id][1]
+        self.items[graph_id][1] = (x0 + x, y0 + y, x1 + x, y1 + y)
+
+    def delete(self, *graph_ids):
+        for graph_id in graph_ids:
+            self.items.pop(graph_id, None)
+
+    def itemconfigure(self, graph_id, **kw):
+        pass
+
+    def zoom_by(self, factor):
+        '''Like ScrollableDrawing.zoom_by, around the origin.'''
+        self.zoom *= factor
+        for item in self.items.values():
+            item[1] = tuple(v * factor for v in item[1])
+
+
+@pytest.fixture
+def drawing():
+    drawing = FakeDrawing()
+    drawing.draw_graphs([{'tags': ('blue', 'rectangle'), 'direction': (10, 10, 20, 20)}])
+    return drawing
+
+
+def test_undo_delete_after_zoom(drawing):
+    history = History(drawing)
+    history.delete([1])
+    drawing.zoom_by(2)
+    history.undo()
+    graph_id, = drawing.items
+    assert drawing.coords(graph_id) == (20, 20, 40, 40)
+
+
+def test_undo_move_and_coords_after_zoom(drawing):
+    history = History(drawing)
+    history.move([1], 5, 0)
+    history.set_coords(1, (15, 10, 30, 30))
+    drawing.zoom_by(4)
+    history.undo()
+    assert drawing.coords(1) == (60, 40, 100, 80)
+    history.undo()
+    assert drawing.coords(1) == (40, 40, 80, 80)
+    drawing.zoom_by(0.5)
+    history.redo()
+    assert drawing.coords(1) == (30, 20, 50, 40)
+
+
+def test_undo_clear_all_keeps_the_tags_and_fills(drawing):
+    drawing.draw_graphs([{'tags': ('red', 'polygon', 'mask'), 'direction': (0, 0, 5, 0, 5, 5)}])
+    history = History(drawing)
+    history.fill(1, 'yellow')
+    history.delete(list(drawing.items))
+    assert not drawing.items
+    history.undo()
+    assert sorted(drawing.items.values()) == [
+        [('blue', 'rectangle'), (10, 10, 20, 20)],
+        [('red', 'polygon', 'mask'), (0, 0, 5, 0, 5, 5)]]
+    history.redo()
+    assert not drawing.items
@@ -0,0 +1,85 @@
+from tkinter import Canvas, Tk, TclError
+import threading
+from PIL import Image
+import pytest
+
+from tkinterx.image_utils import ImageLoader, Prefetcher, TiledImage
+
+
+@pytest.fixture
+def huge_jpeg(tmp_path, monkeypatch):
+    '''A JPEG above the decompression bomb limit of PIL (lowered here).'''
+    path = tmp_path / 'huge.jpg'
+    Image.new('RGB', (2000, 1000), 'red').save(path)
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    with pytest.raises(Image.DecompressionBombError):
+        Image.open(path)
+    return path
+
+
+def test_tiled_image_above_the_bomb_limit(huge_jpeg):
+    assert TiledImage.supports(huge_jpeg)
+    tiled = TiledImage(huge_jpeg, tile_size=16)
+    assert tiled.size == (2000, 1000)
+    assert tiled.tile((tiled.max_level, 0, 0)).size == (16, 8)
+    assert Image.MAX_IMAGE_PIXELS == 1000  # Lifted only for the calls
+
+
+def test_tiled_image_never_decodes_the_levels_above_level_bytes(huge_jpeg):
+    tiled = TiledImage(huge_jpeg, tile_size=16, level_bytes=2000*1000*3 // 2)
+    assert tiled.min_level == 1
+    assert tiled.fit_level((4000, 4000)) == 1
+    tile = tiled.tile((1, 2, 3))
+    assert tile.size == (16, 16) and tile.getpixel((0, 0))[0] > 200
+    assert 0 not in tiled._levels
+
+
+def test_zoom_decodes_the_details_again(tmp_path):
+    try:
+        root = Tk()
+    except TclError:
+        pytest.skip('no display')
+    Image.new('RGB', (640, 480)).save(tmp_path / 'a.jpg')
+    loader = ImageLoader(tmp_path, display_size=(160, 120))
+    loader.create_image(Canvas(root), 0, 0, anchor='nw')
+    layer = loader.image_layer
+    assert layer.detail().size == (160, 120)
+    layer.set_zoom(2)
+    assert layer.detail().size == (320, 240)
+    layer.set_zoom(2.5)  # The next power of two
+    assert layer.detail().size == (640, 480)
+    layer.set_zoom(8)  # Never above the original resolution
+    assert layer.detail().size == (640, 480)
+    loader.close()
+    root.destroy()
+
+
+class SlowLoader:
+    '''The part of an ImageLoader used by Prefetcher, its decodes wait.'''
+
+    def __init__(self):
+        self.cache, self.display_size = {}, None
+        self.started, self.resume = threading.Event(), threading.Event()
+        self.decoded = []
+
+    def __len__(self):
+        return 10
+
+    def path(self, index):
+        return f"{index}.jpg"
+
+    def decode(self, path, size=None):
+        self.started.set()
+        self.resume.wait(10)
+        self.decoded.append(path)
+
+
+def test_prefetcher_shutdown_drops_the_pending_decodes():
+    loader = SlowLoader()
+    prefetcher = Prefetcher(loader, num=3, max_workers=1)
+    prefetcher.schedule(5)
+    assert loader.started.wait(10)
+    prefetcher.shutdown()
+    loader.resume.set()
+    prefetcher._executor.shutdown(wait=True)
+    assert loader.decoded == ['6.jpg']  # Only the running one
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+from PIL import Image
+
+from tkinterx.metadata import ImageInfo, find_pictures, probe_header
+
+
+def test_find_pictures(tmp_path):
+    for name in ('b.jpg', 'a/x.PNG', 'a/b/y.tif', '.hidden/z.jpg', 'notes.txt'):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.new('RGB', (4, 4)).save(path, format='PNG')
+    names, mtimes = find_pictures(tmp_path, max_workers=2)
+    assert names == ['a/b/y.tif', 'a/x.PNG', 'b.jpg']  # Sorted by parts
+    assert set(mtimes) == {'', 'a', 'a/b'}
+    names, _ = find_pictures(tmp_path, recursive=False)
+    assert names == ['b.jpg']
+
+
+def test_find_pictures_symlink_cycle(tmp_path):
+    (tmp_path / 'a').mkdir()
+    Image.new('RGB', (4, 4)).save(tmp_path / 'a' / 'x.jpg')
+    try:
+        os.symlink('..', tmp_path / 'a' / 'up', target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip('no symbolic links')
+    names, _ = find_pictures(tmp_path)
+    assert names == ['a/x.jpg']
+
+
+@pytest.mark.parametrize('fmt, mode, options', [
+    ('PNG', 'RGB', {}), ('PNG', 'RGBA', {}), ('PNG', 'L', {}), ('PNG', 'LA', {}),
+    ('PNG', 'P', {}), ('PNG', '1', {}), ('PNG', 'I;16', {}),
+    ('JPEG', 'RGB', {}), ('JPEG', 'L', {}), ('JPEG', 'CMYK', {}),
+    ('JPEG', 'RGB', {'progressive': True}),
+    ('JPEG', 'RGB', {'exif': b'Exif\0\0' + b'\0' * 2000}),
+    ('BMP', 'RGB', {}), ('TIFF', 'RGB', {}), ('GIF', 'P', {}), ('WEBP', 'RGBA', {})])
+def test_probe_header_as_pil(tmp_path, fmt, mode, options):
+    path = tmp_path / f"picture.{fmt.lower()}"
+    try:
+        Image.new(mode, (37, 21)).save(path, format=fmt, **options)
+    except (KeyError, OSError):
+        pytest.skip(f"PIL cannot write {mode} {fmt}")
+    with Image.open(path) as image:
+        expected = ImageInfo(*image.size, image.mode)
+    assert probe_header(path) == expected
+
+
+def test_probe_header_above_the_bomb_limit(tmp_path, monkeypatch):
+    path = tmp_path / 'large.bmp'
+    Image.new('L', (100, 100)).save(path)
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    assert probe_header(path) == (100, 100, 'L')
+    assert Image.MAX_IMAGE_PIXELS == 1000
+
+
+def test_probe_header_of_a_truncated_jpeg(tmp_path):
+    path = tmp_path / 'picture.jpg'
+    Image.new('RGB', (8, 8)).save(path)
+    path.write_bytes(path.read_bytes()[:4])
+    with pytest.raises(OSError):
+        probe_header(path)
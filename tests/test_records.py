@@ -0,0 +1,40 @@
+import json
+
+from tkinterx.graph.records import GraphTable, Vocabulary, compact_bunch, memory_benchmark
+from tkinterx.graph.shapes import bunch2params, iter_shapes
+
+
+GRAPH = {
+    '1': {'tags': ['blue', 'rectangle'], 'bbox': [0, 0, 5.5, 5]},
+    '2': {'tags': ['red', 'oval_point'], 'bbox': [1, 2, 3, 4]},
+    '3': {'tags': ['red', 'polygon', 'mask'], 'bbox': [0, 0, 9, 0, 9, 9.25]},
+}
+
+
+def test_round_trip_with_the_same_json():
+    table = GraphTable.from_graph(GRAPH)
+    assert json.dumps(table.to_graph()) == json.dumps(GRAPH)
+    assert table['3'] == GRAPH['3']
+    assert list(table) == ['1', '2', '3'] and len(table) == 3
+
+
+def test_shared_vocabularies():
+    colors, shapes = Vocabulary(), Vocabulary()
+    bunch = compact_bunch({'root': '/pictures', 'a.jpg': GRAPH, 'b.jpg': GRAPH})
+    assert bunch['root'] == '/pictures'
+    assert bunch['a.jpg'].colors is bunch['b.jpg'].colors
+    table = GraphTable.from_graph(GRAPH, colors, shapes)
+    assert colors.names == ['blue', 'red'] and len(shapes) == 3
+    assert table.histogram() == {'blue': 1, 'red': 2}
+
+
+def test_iter_shapes_as_the_dicts():
+    table = GraphTable.from_graph(GRAPH)
+    assert list(iter_shapes(table)) == list(iter_shapes(GRAPH))
+    assert bunch2params(table) == bunch2params(GRAPH)
+    assert bunch2params(table)['2']['graph_type'] == 'oval'
+
+
+def test_memory_benchmark():
+    stats = memory_benchmark(num_images=20, num_graphs=50)
+    assert stats['graphs'] == 1000 and stats['ratio'] > 1
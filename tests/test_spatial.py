@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from tkinterx.graph.spatial import GridIndex, distance
+
+
+def random_index(seed, n=300):
+    rng = random.Random(seed)
+    index, bboxes = GridIndex(cell=32, max_cells=16), {}
+    for graph_id in range(1, n+1):
+        x, y = rng.uniform(-500, 500), rng.uniform(-500, 500)
+        w, h = rng.expovariate(1/30), rng.expovariate(1/30)
+        if graph_id % 25 == 0:  # Kept apart as large
+            w, h = w * 20, h * 20
+        bboxes[graph_id] = (x, y, x + w, y + h)
+        index.insert(graph_id, bboxes[graph_id])
+    for graph_id in range(1, n+1, 7):  # Moved or removed
+        if graph_id % 2:
+            index.remove(graph_id)
+            del bboxes[graph_id]
+        else:
+            bboxes[graph_id] = tuple(v + 100 for v in bboxes[graph_id])
+            index.insert(graph_id, bboxes[graph_id])
+    return index, bboxes, rng
+
+
+def brute_nearest(bboxes, x, y, max_distance):
+    def key(graph_id):
+        bbox = bboxes[graph_id]
+        area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+        return distance(x, y, bbox), area, -graph_id
+
+    candidates = [graph_id for graph_id in bboxes if key(graph_id) < (max_distance,)]
+    return min(candidates, key=key, default=None)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_nearest_as_brute_force(seed):
+    index, bboxes, rng = random_index(seed)
+    assert len(index) == len(bboxes)
+    for _ in range(200):
+        x, y = rng.uniform(-800, 800), rng.uniform(-800, 800)
+        max_distance = rng.choice([float('inf'), 20, 100])
+        assert index.nearest(x, y, max_distance) == brute_nearest(bboxes, x, y, max_distance)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_find_overlapping_as_brute_force(seed):
+    index, bboxes, rng = random_index(seed)
+    for size in (0, 10, 200, 3000):  # From a point to more than the occupied cells
+        for _ in range(50):
+            x, y = rng.uniform(-800, 800), rng.uniform(-800, 800)
+            query = (x, y, x + size, y + size)
+            expected = sorted(graph_id for graph_id, b in bboxes.items()
+                              if b[0] <= query[2] and query[0] <= b[2]
+                              and b[1] <= query[3] and query[1] <= b[3])
+            assert index.find_overlapping(query) == expected
+            assert index.find_at(x, y) == index.find_overlapping((x, y, x, y))
+
+
+def test_nested_boxes_prefer_the_inner():
+    index = GridIndex(cell=10)
+    index.insert(1, (0, 0, 100, 100))
+    index.insert(2, (40, 40, 60, 60))
+    index.insert(3, (40, 40, 60, 60))
+    assert index.nearest(50, 50) == 3  # The smallest, then the newest
+    index.clear()
+    assert index.nearest(50, 50) is None and len(index) == 0
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from tkinterx.store import AsyncStore, JsonLinesStore, open_store
+
+
+def graph(color):
+    return {'1': {'tags': [color, 'rectangle'], 'bbox': [0, 0, 1, 1]}}
+
+
+def test_status_index_catches_up_with_the_log(tmp_path):
+    path = tmp_path / 'annotations.jsonl'
+    store = JsonLinesStore(path)
+    store['a'] = graph('red')
+    store['b'] = graph('red')
+    store.close()
+    # A crash between the append to the log and the write of the index
+    store = JsonLinesStore(path)
+    store.status_index.record = lambda items: None
+    store._indexed = lambda: None
+    store['a'] = graph('blue')
+    store.close()
+    store = JsonLinesStore(path)
+    assert store.status_index.find(label='blue') == ['a']
+    assert store.status_index.find(label='red') == ['b']
+    store.close()
+
+
+@pytest.mark.parametrize('name', ['annotations.jsonl', 'annotations.db'])
+def test_reads_never_wait_for_a_write(tmp_path, name):
+    store = AsyncStore(open_store(tmp_path / name))
+    store['a'] = graph('red')
+    store.flush()
+    started, resume = threading.Event(), threading.Event()
+    update = store.store.update
+
+    def slow_update(items):
+        started.set()
+        resume.wait(10)
+        update(items)
+
+    store.store.update = slow_update
+    store['b'] = graph('blue')
+    assert started.wait(10)  # The writer holds its lock
+    begin = time.perf_counter()
+    assert store['a'] == graph('red') and store['b'] == graph('blue')
+    assert 'a' in store and 'c' not in store
+    assert store.status('a').colors == {'red': 1}
+    assert time.perf_counter() - begin < 1
+    resume.set()
+    store.flush()
+    assert store.find(label='blue') == ['b']
+    store.close()
+
+
+def test_reader_follows_the_compaction(tmp_path):
+    store = AsyncStore(JsonLinesStore(tmp_path / 'annotations.jsonl', compact_min=2))
+    store['a'] = graph('red')
+    store.flush()
+    assert store['a'] == graph('red')  # Opens the log in the reader
+    for color in ('green', 'blue', 'red', 'blue'):
+        store['b'] = graph(color)
+        store.flush()
+    assert store.store._generation > 1  # Compacted
+    assert store['a'] == graph('red') and store['b'] == graph('blue')
+    store.close()
+
+
+def test_one_process_per_log(tmp_path):
+    path = tmp_path / 'annotations.jsonl'
+    store = JsonLinesStore(path)
+    with pytest.raises(OSError, match='another process'):
+        JsonLinesStore(path)
+    store.close()
+    JsonLinesStore(path).close()  # Released by close
+
+
+def test_compaction_keeps_the_live_graphs(tmp_path):
+    path = tmp_path / 'annotations.jsonl'
+    store = JsonLinesStore(path, compact_min=4)
+    store['a'] = graph('red')
+    for color in ('green', 'blue', 'red', 'blue', 'green', 'red'):
+        store['b'] = graph(color)
+    del store['a']
+    store['c'] = graph('blue')
+    store.close()
+    lines = path.read_bytes().splitlines()
+    assert len(lines) < 9  # Rewritten without the stale lines
+    store = JsonLinesStore(path)
+    assert dict(store) == {'b': graph('red'), 'c': graph('blue')}
+    assert store.find(label='red') == ['b']
+    store.close()
+
+
+def test_torn_line_is_dropped(tmp_path):
+    path = tmp_path / 'annotations.jsonl'
+    store = JsonLinesStore(path)
+    store['a'] = graph('red')
+    store.close()
+    with open(path, 'ab') as fp:  # A crash in the middle of a write
+        fp.write(b'["b", {"1": {"tags": ["bl')
+    store = JsonLinesStore(path)
+    assert list(store) == ['a']
+    store['c'] = graph('blue')
+    store.close()
+    store = JsonLinesStore(path)
+    assert dict(store) == {'a': graph('red'), 'c': graph('blue')}
+    store.close()
+
+
+@pytest.mark.parametrize('name', ['annotations.jsonl', 'annotations.db'])
+@pytest.mark.parametrize('wrapped', [False, True])
+def test_none_is_a_deletion(tmp_path, name, wrapped):
+    def open_(path):
+        store = open_store(path)
+        return AsyncStore(store) if wrapped else store
+
+    store = open_(tmp_path / name)
+    store.update({'a': graph('red'), 'b': graph('blue')})
+    store['a'] = None
+    assert 'a' not in store and store.status('a') is None
+    with pytest.raises(KeyError):
+        store['a']
+    store.close()
+    store = open_(tmp_path / name)
+    assert list(store) == ['b'] and 'a' not in store
+    assert store.find() == ['b']
+    store.close()
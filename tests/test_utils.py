@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from tkinterx.utils import LazyBunch, save_bunch
+
+
+BUNCH = {
+    'root': '/data/images',
+    'a.jpg': {'1': {'tags': ['red', 'rectangle'], 'bbox': [0, 0, 10, 10]}},
+    'é.jpg': {},
+    'b.jpg': {'2': {'tags': ['blue', 'oval'], 'bbox': [1.5, 2, 3, 4e2]}},
+    'c': [1, 'two', None, True, {'x': []}, 'ü'],
+}
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'bunch.json'
+    save_bunch(BUNCH, path)
+    return path
+
+
+def test_every_window_boundary(path):
+    '''The scan windows end at every offset of the file, including right
+    after a comma.'''
+    for window in range(1, path.stat().st_size + 2):
+        bunch = LazyBunch(path, window=window)
+        assert dict(bunch) == BUNCH, window
+        bunch.close()
+
+
+def test_every_window_boundary_indented(tmp_path):
+    path = tmp_path / 'bunch.json'
+    path.write_text(json.dumps(BUNCH, indent=4), encoding='utf-8')
+    for window in range(1, path.stat().st_size + 2):
+        bunch = LazyBunch(path, window=window)
+        assert dict(bunch) == BUNCH, window
+        bunch.close()
+
+
+def test_iter_array_every_window_boundary(tmp_path):
+    path = tmp_path / 'coco.json'
+    coco = {'images': [{'id': i, 'file_name': f'{i}.jpg'} for i in range(20)],
+            'annotations': []}
+    path.write_text(json.dumps(coco, indent=1), encoding='utf-8')
+    for window in range(1, 200):
+        bunch = LazyBunch(path, window=window)
+        assert list(bunch.iter_array('images')) == coco['images'], window
+        assert list(bunch.iter_array('annotations')) == []
+        bunch.close()
+
+
+def test_invalid_json(tmp_path):
+    path = tmp_path / 'bunch.json'
+    path.write_text('{"a": [1, 2}', encoding='utf-8')
+    with pytest.raises(ValueError):
+        len(LazyBunch(path, window=4))
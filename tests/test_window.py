@@ -0,0 +1,119 @@
+from tkinter import Tk, TclError
+import pytest
+from PIL import Image
+
+from tkinterx.graph.canvas_design import SelectorFrame
+from tkinterx.window import GraphDrawing, GraphWindow
+
+
+@pytest.fixture
+def pictures(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # The store is written under data/
+    pictures = tmp_path / 'pictures'
+    pictures.mkdir()
+    for k in range(3):
+        Image.new('RGB', (64, 48)).save(pictures / f"{k}.png")
+    return pictures
+
+
+@pytest.fixture
+def drawing(pictures):
+    try:
+        root = Tk()
+    except TclError:
+        pytest.skip('no display')
+    selector_frame = SelectorFrame(root, 'rectangle', 'blue')
+    drawing = GraphDrawing(root, selector_frame, width=200, height=200)
+    drawing.fit_viewport = False
+    drawing.image_loader = drawing.create_loader(pictures)
+    drawing.page_num = len(drawing.image_loader)
+    drawing.bunch = drawing.open_store()
+    drawing.page_var.set(0)
+    drawing.set_image()
+    yield drawing
+    if hasattr(drawing.bunch, 'close'):
+        drawing.bunch.close()
+    try:
+        root.destroy()
+    except TclError:  # Destroyed by the test
+        pass
+
+
+def draw_box(drawing, bbox, color='blue'):
+    graph_ids = drawing.draw_graphs([{'graph_type': 'rectangle', 'direction': bbox,
+                                      'color': color, 'tags': (color, 'rectangle')}])
+    drawing.history.created(graph_ids)
+
+
+def test_page_change_keeps_the_graphs_of_each_picture(drawing):
+    draw_box(drawing, (1, 2, 10, 20))
+    drawing.next_page()
+    assert len(drawing.model) == 0  # The graphs of 0.png are gone
+    assert not drawing.history.can_undo
+    draw_box(drawing, (5, 5, 30, 30), 'red')
+    drawing.autosaver.flush()
+    drawing.bunch.flush()
+    first, second = drawing.bunch['0.png'], drawing.bunch['1.png']
+    assert [cats['bbox'] for cats in first.values()] == [[1, 2, 10, 20]]
+    assert [cats['tags'] for cats in second.values()] == [['red', 'rectangle']]
+    drawing.prev_page()
+    assert len(drawing.model) == 1  # Redrawn from the store
+
+
+def test_save_keeps_every_graph(drawing):
+    draw_box(drawing, (1, 2, 10, 20))
+    graph_ids = drawing.draw_graphs([{'graph_type': 'oval', 'direction': (5, 5, 30, 30),
+                                      'color': 'red', 'tags': ('red', 'oval')}])
+    drawing.history.created(graph_ids)
+    drawing.autosaver.flush()
+    drawing.save_rectangle()  # Ctrl+S after an autosave
+    drawing.bunch.flush()
+    shapes = sorted(cats['tags'][1] for cats in drawing.bunch['0.png'].values())
+    assert shapes == ['oval', 'rectangle']
+
+
+def test_close_despite_a_failed_write(drawing, monkeypatch):
+    errors = []
+    monkeypatch.setattr('tkinterx.window.messagebox.showerror',
+                        lambda *args: errors.append(args))
+    store = drawing.bunch
+    close = store.close
+
+    def fail():
+        close()
+        raise OSError('disk full')
+
+    monkeypatch.setattr(store, 'close', fail)
+    drawing.close()
+    assert errors and drawing.bunch == {}
+    with pytest.raises(TclError):  # Destroyed anyway
+        drawing.winfo_exists()
+
+
+def test_graph_window_page_change(pictures):
+    try:
+        window = GraphWindow()
+    except TclError:
+        pytest.skip('no display')
+    window.bunch = window.open_store()
+    window.create_image(pictures.as_posix())
+    draw_box(window.drawing, (1, 2, 10, 20))
+    window.next_image()
+    assert len(window.drawing.model) == 0  # The graphs of 0.png are gone
+    assert not window.drawing.history.can_undo
+    window.prev_image()
+    assert len(window.drawing.model) == 1  # Redrawn from the store
+    window.close()
+
+
+def test_viewport_size_follows_the_canvas(drawing):
+    drawing.fit_viewport = True
+    drawing.configure(width='5c', height='4c')  # Tk distances
+    width, height = drawing.viewport_size
+    assert width > height > 1
+    drawing.pack(expand=True, fill='both')
+    drawing.master.geometry('300x250')
+    drawing.update()
+    assert drawing.viewport_size == (drawing.winfo_width(), drawing.winfo_height())
+    drawing.set_image()  # Decoded for the new size
+    assert drawing.image_loader.display_size == drawing.viewport_size
@@ -0,0 +1,45 @@
+from tkinterx.store import AsyncStore, SQLiteStore
+from tkinterx.work_queue import WorkQueue
+
+
+BOX = {'1': {'tags': ['red', 'rectangle'], 'bbox': [0, 0, 5, 5]}}
+NAMES = ['a.jpg', 'b.jpg', 'c.jpg', 'd.jpg']
+
+
+def test_done_means_with_boxes(tmp_path):
+    store = SQLiteStore(tmp_path / 'annotations.db')
+    store['a.jpg'] = BOX
+    store['b.jpg'] = {}  # Saved without boxes: still to do
+    queue = WorkQueue(store, NAMES)
+    assert queue.done == {'a.jpg'}
+    assert [queue.take(), queue.peek()] == ['b.jpg', 'c.jpg']
+    queue.submit('b.jpg', BOX)
+    assert queue.remaining == 2
+    queue.close()
+    store.close()
+
+
+def test_two_annotators_never_share_a_picture(tmp_path):
+    first = AsyncStore(SQLiteStore(tmp_path / 'annotations.db', owner='first'))
+    second = AsyncStore(SQLiteStore(tmp_path / 'annotations.db', owner='second'))
+    first_queue, second_queue = WorkQueue(first, NAMES), WorkQueue(second, NAMES)
+    taken = [first_queue.take(), second_queue.take(), first_queue.peek(), second_queue.peek()]
+    assert sorted(taken) == NAMES
+    first_queue.submit(taken[0], BOX)
+    assert second_queue.take() == taken[3]  # The peeked one
+    # a.jpg is done, c.jpg leased by the first one: b.jpg, given back by take
+    assert second_queue.take() == taken[1]
+    first_queue.close()
+    second_queue.close()
+    first.close()
+    second.close()
+
+
+def test_queued_graphs_are_done_without_a_flush(tmp_path):
+    store = AsyncStore(SQLiteStore(tmp_path / 'annotations.db'))
+    store.store.update = lambda items: None  # The writer never finishes
+    store['a.jpg'] = BOX
+    assert WorkQueue(store, NAMES).done == {'a.jpg'}
+    assert store.find(label='red') == ['a.jpg']
+    store._pending.clear()  # Nothing to write at close
+    store.close()
@@ -0,0 +1,87 @@
+'''The `tkinterx` command, it never creates a Tk window.
+
+Example
+======================
+tkinterx export coco data/annotations.jsonl coco.json
+tkinterx export yolo data/annotations.json labels --images /data/pictures
+tkinterx import voc Annotations data/annotations.jsonl
+'''
+import argparse
+import time
+
+from .convert import (exporters, open_annotations, import_coco,
+                      import_yolo, import_voc)
+from .store import open_store
+
+
+def export(args):
+    bunch = open_annotations(args.annotations)
+    root = args.images or bunch.get('root')
+    if not root:
+        raise SystemExit("The picture directory is unknown, use --images")
+    skipped = []
+    num_boxes = exporters[args.format](bunch, root, args.output,
+                                       args.category, args.workers, skipped)
+    bunch.close()
+    if skipped:
+        print(f"Skipped {len(skipped)} records whose picture cannot be read, "
+              f"like {skipped[0]}")
+    return num_boxes
+
+
+def import_(args):
+    store = open_store(args.annotations)
+    if args.images:
+        store['root'] = args.images
+    if args.format == 'coco':
+        num_boxes = import_coco(args.input, store)
+    elif args.format == 'yolo':
+        root = args.images or store.get('root')
+        if not root:
+            raise SystemExit("YOLO needs the picture sizes, use --images")
+        num_boxes = import_yolo(args.input, root, store, args.workers)
+    else:
+        num_boxes = import_voc(args.input, store)
+    store.close()
+    return num_boxes
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        prog='tkinterx', description='Convert the annotations of tkinterx.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser(
+        'export', help='annotations -> COCO, YOLO or Pascal VOC')
+    export_parser.add_argument('format', choices=sorted(exporters))
+    export_parser.add_argument(
+        'annotations', help="'*.jsonl', '*.db' store or '*.json' file")
+    export_parser.add_argument(
+        'output', help='a JSON file for COCO, a directory otherwise')
+    export_parser.add_argument('--category', choices=('color', 'shape'), default='color',
+                               help='the tag used as the class of the boxes')
+    export_parser.set_defaults(func=export)
+    import_parser = commands.add_parser(
+        'import', help='COCO, YOLO or Pascal VOC -> annotations')
+    import_parser.add_argument('format', choices=sorted(exporters))
+    import_parser.add_argument(
+        'input', help='a JSON file for COCO, a directory otherwise')
+    import_parser.add_argument('annotations', help="'*.jsonl' or '*.db' store")
+    import_parser.set_defaults(func=import_)
+    for sub_parser in (export_parser, import_parser):
+        sub_parser.add_argument('--images', help="the picture directory, "
+                                "the 'root' of the annotations by default")
+        sub_parser.add_argument('--workers', type=int, default=None,
+                                help='processes probing the picture sizes')
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    start = time.perf_counter()
+    num_boxes = args.func(args)
+    print(f"{args.command} {args.format}: {num_boxes} boxes "
+          f"in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+'''Convert the annotations to and from COCO, YOLO and Pascal VOC, without a display.
+
+The annotations are the records written by `GraphDrawing.save_graph`:
+image name -> {graph_id: {'tags': (color, shape), 'bbox': (x_0, y_0, x_1, y_1)}},
+plus the 'root' directory of the pictures. The records are streamed one by
+one and the image sizes are probed by a process pool, chunk by chunk, so the
+memory stays bounded whatever the number of boxes.
+'''
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from xml.etree import ElementTree
+import json
+import os
+import shutil
+import tempfile
+
+from .graph.boxes import BoxArray
+from .metadata import find_pictures, probe_header
+from .store import open_store
+from .utils import load_bunch, mkdir
+
+
+def open_annotations(path):
+    '''A store ('*.jsonl', '*.db') or a LazyBunch of a JSON file ('*.json').'''
+    if Path(path).suffix == '.json':
+        return load_bunch(path, lazy=True)
+    return open_store(path)
+
+
+def iter_records(bunch):
+    '''Yield (name, graph) of each image.'''
+    for name in bunch:
+        if name != 'root':
+            yield name, bunch[name]
+
+
+def iter_boxes(graph, category='color', size=None):
+    '''Yield (label, x_0, y_0, x_1, y_1) with x_0 < x_1 and y_0 < y_1.
+
+    :param graph: The graph of `get_graph`, a BoxArray or a GraphTable. The
+        polygons are exported as their bounding box.
+    :param category: The label is the 'color' or the 'shape' tag of the graph.
+        Points and degenerated boxes are skipped.
+    :param size: (width, height) of the picture, the boxes are clipped to it.
+    '''
+    boxes = graph if isinstance(graph, BoxArray) else BoxArray.from_graph(graph)
+    if size:
+        boxes = boxes.clip(*size)
+    yield from boxes.iter_boxes(category)
+
+
+def image_size(path):
+    '''(width, height) from the header of the picture, None if it is
+    missing or not a picture.'''
+    try:
+        return probe_header(path)[:2]
+    except (OSError, ValueError, SyntaxError):
+        return None
+
+
+def with_sizes(root, records, workers=None, chunk=1024, skipped=None):
+    '''Yield (name, graph, (width, height)), the sizes of each chunk of
+    records are probed in parallel.
+
+    :param skipped: A list, the names of the records whose picture cannot
+        be read are appended to it. These records are not yielded.
+    '''
+    with ProcessPoolExecutor(workers) as executor:
+        while True:
+            batch = list(islice(records, chunk))
+            if not batch:
+                break
+            paths = [os.path.join(root, name) for name, _ in batch]
+            sizes = executor.map(image_size, paths, chunksize=64)
+            for (name, graph), size in zip(batch, sizes):
+                if size is None:
+                    if skipped is not None:
+                        skipped.append(name)
+                    continue
+                yield name, graph, size
+
+
+class LabelMap(dict):
+    '''label -> id, from start, in the order of appearance.'''
+
+    def __init__(self, start=0):
+        super().__init__()
+        self.start = start
+
+    def __missing__(self, label):
+        self[label] = len(self) + self.start
+        return self[label]
+
+
+def export_coco(bunch, root, output, category='color', workers=None, skipped=None):
+    '''Write one COCO JSON file, the annotations go through a temporary
+    file so that the images and the annotations are written in one pass.
+    The file is written to '<output>.tmp' first, an error never leaves a
+    truncated output.
+
+    :param skipped: See `with_sizes`, the same for the other exporters.
+    '''
+    temp_path = f"{output}.tmp"
+    try:
+        num_boxes = _write_coco(bunch, root, temp_path, category, workers, skipped)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, output)
+    return num_boxes
+
+
+def _write_coco(bunch, root, output, category, workers, skipped):
+    labels = LabelMap(start=1)
+    num_boxes = 0
+    with open(output, 'w', encoding='utf-8') as fp, \
+            tempfile.TemporaryFile('w+', encoding='utf-8') as annotations:
+        fp.write('{"images": [')
+        records = with_sizes(root, iter_records(bunch), workers, skipped=skipped)
+        for image_id, (name, graph, (width, height)) in enumerate(records, 1):
+            image = {'id': image_id, 'file_name': name, 'width': width, 'height': height}
+            fp.write((',\n' if image_id > 1 else '\n') + json.dumps(image, ensure_ascii=False))
+            for label, x0, y0, x1, y1 in iter_boxes(graph, category, (width, height)):
+                num_boxes += 1
+                w, h = x1 - x0, y1 - y0
+                annotation = {'id': num_boxes, 'image_id': image_id,
+                              'category_id': labels[label], 'bbox': [x0, y0, w, h],
+                              'area': w * h, 'iscrowd': 0}
+                annotations.write((',\n' if num_boxes > 1 else '\n') + json.dumps(annotation))
+        fp.write('],\n"annotations": [')
+        annotations.seek(0)
+        shutil.copyfileobj(annotations, fp)
+        categories = [{'id': k, 'name': label} for label, k in labels.items()]
+        fp.write('],\n"categories": ' + json.dumps(categories, ensure_ascii=False) + '}\n')
+    return num_boxes
+
+
+def export_yolo(bunch, root, output, category='color', workers=None, skipped=None):
+    '''Write one '<stem>.txt' per picture and the class names in 'classes.txt'.'''
+    mkdir(output)
+    labels = LabelMap()
+    num_boxes = 0
+    records = with_sizes(root, iter_records(bunch), workers, skipped=skipped)
+    for name, graph, (width, height) in records:
+        lines = []
+        for label, x0, y0, x1, y1 in iter_boxes(graph, category, (width, height)):
+            cx, cy = (x0 + x1) / 2 / width, (y0 + y1) / 2 / height
+            w, h = (x1 - x0) / width, (y1 - y0) / height
+            lines.append(f"{labels[label]} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n")
+        num_boxes += len(lines)
+        path = Path(output) / Path(name).with_suffix('.txt')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(''.join(lines))
+    with open(Path(output) / 'classes.txt', 'w', encoding='utf-8') as fp:
+        fp.writelines(f"{label}\n" for label in labels)
+    return num_boxes
+
+
+def export_voc(bunch, root, output, category='color', workers=None, skipped=None):
+    '''Write one Pascal VOC '<stem>.xml' per picture.'''
+    mkdir(output)
+    num_boxes = 0
+    records = with_sizes(root, iter_records(bunch), workers, skipped=skipped)
+    for name, graph, (width, height) in records:
+        annotation = ElementTree.Element('annotation')
+        ElementTree.SubElement(annotation, 'filename').text = name
+        size = ElementTree.SubElement(annotation, 'size')
+        for key, value in (('width', width), ('height', height), ('depth', 3)):
+            ElementTree.SubElement(size, key).text = str(value)
+        for label, x0, y0, x1, y1 in iter_boxes(graph, category, (width, height)):
+            num_boxes += 1
+            obj = ElementTree.SubElement(annotation, 'object')
+            ElementTree.SubElement(obj, 'name').text = label
+            bndbox = ElementTree.SubElement(obj, 'bndbox')
+            for key, value in zip(('xmin', 'ymin', 'xmax', 'ymax'), (x0, y0, x1, y1)):
+                ElementTree.SubElement(bndbox, key).text = str(round(value))
+        path = Path(output) / Path(name).with_suffix('.xml')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        ElementTree.ElementTree(annotation).write(path, encoding='utf-8')
+    return num_boxes
+
+
+def make_graph(boxes, shape='rectangle', start=1):
+    '''[(label, x_0, y_0, x_1, y_1), ...] -> the graph of `get_graph`'''
+    return {str(k): {'tags': [label, shape], 'bbox': [x0, y0, x1, y1]}
+            for k, (label, x0, y0, x1, y1) in enumerate(boxes, start)}
+
+
+def merge_graph(store, name, boxes):
+    '''Append the boxes to the record of name.'''
+    graph = store.get(name, {})
+    graph.update(make_graph(boxes, start=len(graph)+1))
+    store[name] = graph
+
+
+def import_coco(path, store):
+    '''Stream the annotations of a COCO file, the consecutive annotations of
+    one image are merged into its record at once.'''
+    coco = load_bunch(path, lazy=True)
+    labels = {c['id']: c['name'] for c in coco.iter_array('categories')}
+    names = {image['id']: image['file_name'] for image in coco.iter_array('images')}
+    num_boxes = 0
+    image_id, boxes = None, []
+    for annotation in coco.iter_array('annotations'):
+        if annotation['image_id'] != image_id:
+            if boxes:
+                merge_graph(store, names[image_id], boxes)
+            image_id, boxes = annotation['image_id'], []
+        x, y, w, h = annotation['bbox']
+        boxes.append((labels[annotation['category_id']], x, y, x + w, y + h))
+        num_boxes += 1
+    if boxes:
+        merge_graph(store, names[image_id], boxes)
+    coco.close()
+    return num_boxes
+
+
+def _read_yolo(args):
+    txt_path, image_path, classes = args
+    width, height = image_size(image_path)
+    boxes = []
+    with open(txt_path) as fp:
+        for line in fp:
+            if line.strip():
+                k, cx, cy, w, h = line.split()[:5]
+                cx, w = float(cx) * width, float(w) * width
+                cy, h = float(cy) * height, float(h) * height
+                boxes.append((classes[int(k)], cx - w/2, cy - h/2, cx + w/2, cy + h/2))
+    return boxes
+
+
+def import_yolo(path, root, store, workers=None, chunk=1024):
+    '''Read '<stem>.txt' and 'classes.txt' of path, the images (in root) give
+    the sizes to denormalize the boxes.'''
+    path = Path(path)
+    classes = [line.strip() for line in
+               (path / 'classes.txt').read_text(encoding='utf-8').splitlines()
+               if line.strip()]
+    names, _ = find_pictures(root)
+    images = {name.rsplit('.', 1)[0]: Path(root) / name for name in names}
+    txt_paths = (p for p in path.rglob('*.txt') if p.name != 'classes.txt')
+    num_boxes = 0
+    with ProcessPoolExecutor(workers) as executor:
+        while True:
+            batch = [(p, images.get(p.relative_to(path).with_suffix('').as_posix()))
+                     for p in islice(txt_paths, chunk)]
+            if not batch:
+                break
+            batch = [(p, image_path) for p, image_path in batch if image_path]
+            args = [(p, image_path, classes) for p, image_path in batch]
+            for (_, image_path), boxes in zip(batch, executor.map(_read_yolo, args, chunksize=64)):
+                store[image_path.relative_to(root).as_posix()] = make_graph(boxes)
+                num_boxes += len(boxes)
+    return num_boxes
+
+
+def import_voc(path, store):
+    '''Read every Pascal VOC '*.xml' of path.'''
+    num_boxes = 0
+    for xml_path in Path(path).rglob('*.xml'):
+        annotation = ElementTree.parse(xml_path).getroot()
+        boxes = []
+        for obj in annotation.iter('object'):
+            bndbox = obj.find('bndbox')
+            boxes.append((obj.findtext('name'),
+                          *(float(bndbox.findtext(key)) for key in ('xmin', 'ymin', 'xmax', 'ymax'))))
+        name = annotation.findtext('filename') or xml_path.with_suffix('.jpg').name
+        store[name] = make_graph(boxes)
+        num_boxes += len(boxes)
+    return num_boxes
+
+
+exporters = {'coco': export_coco, 'yolo': export_yolo, 'voc': export_voc}
@@ -0,0 +1,164 @@
+'''Page through the frames of a '.npy' stack or a raw sensor dump.
+
+The file is memory-mapped and each frame is wrapped by `Image.frombuffer`
+without reading the others, so a stack of several GB opens at once. NumPy
+is not needed, the '.npy' header is parsed here.
+'''
+from collections.abc import Sequence
+from pathlib import Path
+import ast
+import mmap
+import os
+import struct
+import sys
+from PIL import Image
+
+from .image_utils import ImageLoader
+from .metadata import ImageInfo
+
+
+_channel_modes = {1: 'L', 3: 'RGB', 4: 'RGBA'}
+
+
+def read_npy_header(fp):
+    '''(shape, descr, offset of the data) of an opened '.npy' file.'''
+    if fp.read(6) != b'\x93NUMPY':
+        raise ValueError(f"{fp.name} is not a .npy file")
+    major, _ = fp.read(2)
+    if major == 1:
+        length, = struct.unpack('<H', fp.read(2))
+    else:
+        length, = struct.unpack('<I', fp.read(4))
+    header = ast.literal_eval(fp.read(length).decode('latin-1'))
+    if header['fortran_order']:
+        raise ValueError(f"{fp.name}: Fortran order is not supported")
+    return tuple(header['shape']), header['descr'], fp.tell()
+
+
+class FrameStack(Sequence):
+    '''The frames of a memory-mapped file, as PIL images.
+
+    Each frame is (height, width) or (height, width, channels) of unsigned
+    bytes ('L', 'RGB', 'RGBA'), or (height, width) of 16 bits shown by their
+    high byte. The 'L' and 'RGBA' frames share the memory of the file, the
+    others are unpacked frame by frame.
+
+    Example
+    ======================
+    frames = FrameStack('video.npy')  # shape (N, H, W) or (N, H, W, C)
+    frames = FrameStack('sensor.raw', shape=(1024, 1280), dtype='<u2')
+    image = frames[100]  # Reads only the pages of the frame 100
+    frames.close()
+    '''
+
+    def __init__(self, path, shape=None, dtype='u1', offset=0):
+        '''
+        :param path: A '.npy' file, or a raw dump when shape is given.
+        :param shape: The shape of one frame of the raw dump.
+        :param dtype: 'u1', or '<u2'/'>u2', of the raw dump.
+        :param offset: The bytes before the first frame of the raw dump.
+        '''
+        self.path = path
+        self._fp = open(path, 'rb')
+        num = None
+        if shape is None:
+            shape, dtype, offset = read_npy_header(self._fp)
+            if len(shape) == 2 or (len(shape) == 3 and shape[2] in (3, 4)):
+                shape = (1, *shape)  # A single frame
+            num, shape = shape[0], shape[1:]
+        if dtype.lstrip('|<>=') == 'u1':  # The byte order of one byte is irrelevant
+            dtype = 'u1'
+        elif dtype in ('u2', '=u2'):
+            dtype = ('<' if sys.byteorder == 'little' else '>') + 'u2'
+        height, width, channels = (*shape, 1)[:3]
+        if dtype == 'u1':
+            itemsize, self.rawmode = 1, _channel_modes.get(channels)
+        elif dtype in ('<u2', '>u2') and channels == 1:
+            itemsize, self.rawmode = 2, 'L;16' if dtype[0] == '<' else 'L;16B'
+        else:
+            raise ValueError(f"{path}: unsupported frames {shape} of {dtype}")
+        if self.rawmode is None:
+            raise ValueError(f"{path}: unsupported {channels} channels")
+        self.mode = _channel_modes[channels]
+        self.size = width, height
+        self.offset = offset
+        self.frame_bytes = width * height * channels * itemsize
+        file_size = os.fstat(self._fp.fileno()).st_size
+        available = (file_size - offset) // self.frame_bytes if self.frame_bytes else 0
+        self._len = available if num is None else min(num, available)
+        if self._len == 0:
+            raise ValueError(f"{path} has no frame")
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+
+    def __getitem__(self, index):
+        if not -self._len <= index < self._len:
+            raise IndexError(index)
+        start = self.offset + (index % self._len) * self.frame_bytes
+        data = self._view[start:start + self.frame_bytes]
+        return Image.frombuffer(self.mode, self.size, data, 'raw', self.rawmode, 0, 1)
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def info(self):
+        return ImageInfo(*self.size, self.mode)
+
+    def close(self):
+        self._view.release()
+        try:
+            self._mm.close()
+        except BufferError:  # Frames still in use, closed when they are freed
+            pass
+        self._fp.close()
+
+
+class FrameLoader(ImageLoader):
+    '''An ImageLoader over the frames of one FrameStack.
+
+    The names are the frame numbers ('000012'), the paths are
+    '<file>/<name>', so the annotations are keyed by frame and
+    `bunch['root']` is the file. Next/Prev page through the frames.
+
+    Example
+    ======================
+    loader = FrameLoader('video.npy', prefetch=2)
+    loader.current_id = 100
+    image = loader.current_image
+    '''
+
+    def __init__(self, path, shape=None, dtype='u1', offset=0, **kw):
+        '''
+        :param path, shape, dtype, offset: See FrameStack.
+        :param kw: See ImageLoader, the frames are never tiled.
+        '''
+        self.frames = FrameStack(path, shape, dtype, offset)
+        kw['tile_size'] = None
+        super().__init__(path, **kw)
+
+    def scan(self):
+        width = max(len(str(len(self.frames) - 1)), 6)
+        return [f"{k:0{width}d}" for k in range(len(self.frames))]
+
+    def decode(self, path, size=None):
+        image = self.frames[int(Path(path).name)]
+        original_size = image.size
+        if size:
+            image.thumbnail(size)  # Resampled into a new buffer
+        image.info['original_size'] = original_size
+        return image
+
+    def info(self, path):
+        return self.frames.info
+
+    def close(self):
+        super().close()
+        self.frames.close()
+
+
+def open_loader(root, **kw):
+    '''A FrameLoader for a '.npy' file, an ImageLoader for a directory.'''
+    if Path(root).suffix.lower() == '.npy':
+        return FrameLoader(root, **kw)
+    return ImageLoader(root, **kw)
@@ -0,0 +1,215 @@
+'''Vectorized operations on many boxes at once, with NumPy.
+'''
+import numpy as np
+
+from .shapes import iter_shapes
+from .spatial import coords2bbox
+
+
+class BoxArray:
+    '''The boxes of a graph as arrays: coordinates and label identifiers.
+
+    `coords` is an (n, 4) float array of (x_0, y_0, x_1, y_1), `labels` an
+    (n, 2) int array of (color_id, shape_id) into `colors` and `shapes`,
+    `ids` the graph identifiers. The operations return new arrays. The
+    exports read the boxes of the graphs through it, see `convert.iter_boxes`.
+
+    Example
+    ======================
+    boxes = BoxArray.from_graph(drawing.get_graph('all'))
+    boxes = boxes.scale(2).translate(10, 0).clip(1920, 1080)
+    boxes = boxes.dedup(0.9)  # Drop the repeated boxes of a label
+    drawing.draw_graphs(bunch2params(boxes).values())
+    store[name] = boxes.to_graph()
+    '''
+
+    def __init__(self, coords=(), labels=(), colors=(), shapes=(), ids=None):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 4)
+        self.labels = np.asarray(labels, dtype=np.int32).reshape(-1, 2)
+        self.colors = list(colors)
+        self.shapes = list(shapes)
+        self.ids = list(range(1, len(self.coords)+1)) if ids is None else list(ids)
+
+    @classmethod
+    def from_graph(cls, graph):
+        '''The boxes of a graph of `get_graph` (or a GraphTable). The shapes
+        of more than two points (polygons, lines) are kept as their bounding
+        box.'''
+        colors, shapes = {}, {}
+        ids, coords, labels = [], [], []
+        for graph_id, tags, bbox in iter_shapes(graph):
+            color, shape = tags[:2]
+            ids.append(graph_id)
+            coords.append(bbox if len(bbox) == 4 else coords2bbox(bbox))
+            labels.append((colors.setdefault(color, len(colors)),
+                           shapes.setdefault(shape, len(shapes))))
+        return cls(coords, labels, colors, shapes, ids)
+
+    def to_graph(self):
+        '''The inverse of `from_graph`, the integral coordinates stay int.'''
+        graph = {}
+        for graph_id, bbox, (color_id, shape_id) in zip(
+                self.ids, self.coords.tolist(), self.labels.tolist()):
+            graph[graph_id] = {
+                'tags': [self.colors[color_id], self.shapes[shape_id]],
+                'bbox': _plain(bbox)}
+        return graph
+
+    def iter_shapes(self):
+        '''Yield (graph_id, (color, shape), bbox), see `shapes.iter_shapes`.'''
+        for graph_id, bbox, (color_id, shape_id) in zip(
+                self.ids, self.coords.tolist(), self.labels.tolist()):
+            yield graph_id, (self.colors[color_id], self.shapes[shape_id]), bbox
+
+    def iter_boxes(self, category='color'):
+        '''Yield (label, x_0, y_0, x_1, y_1), sorted corners, without the
+        degenerated boxes, see `convert.iter_boxes`. The integral coordinates
+        are int.'''
+        names = self.colors if category == 'color' else self.shapes
+        label_ids = self.labels[:, 0 if category == 'color' else 1]
+        boxes = self.normalized()
+        keep = boxes.area() > 0
+        for label_id, bbox in zip(label_ids[keep].tolist(), boxes.coords[keep].tolist()):
+            yield (names[label_id], *_plain(bbox))
+
+    def _new(self, coords, index=slice(None)):
+        ids = np.asarray(self.ids, dtype=object)[index].tolist()
+        return type(self)(coords, self.labels[index], self.colors, self.shapes, ids)
+
+    def __getitem__(self, index):
+        '''A subset by an integer array or a boolean mask.'''
+        return self._new(self.coords[index], index)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def translate(self, dx, dy):
+        return self._new(self.coords + (dx, dy, dx, dy))
+
+    def scale(self, x_scale, y_scale=None, x=0, y=0):
+        '''Like Canvas.scale, around (x, y).'''
+        if y_scale is None:
+            y_scale = x_scale
+        origin = np.array((x, y, x, y))
+        return self._new(origin + (self.coords - origin) * (x_scale, y_scale, x_scale, y_scale))
+
+    def normalized(self):
+        '''With x_0 <= x_1 and y_0 <= y_1.'''
+        c = self.coords
+        return self._new(np.stack([np.minimum(c[:, 0], c[:, 2]), np.minimum(c[:, 1], c[:, 3]),
+                                   np.maximum(c[:, 0], c[:, 2]), np.maximum(c[:, 1], c[:, 3])],
+                                  axis=1))
+
+    def clip(self, width, height):
+        '''Clip to the picture (0, 0, width, height).'''
+        return self._new(np.clip(self.coords, 0, (width, height, width, height)))
+
+    def area(self):
+        c = self.normalized().coords
+        return (c[:, 2] - c[:, 0]) * (c[:, 3] - c[:, 1])
+
+    def iou(self, other=None):
+        '''The (n, m) matrix of the intersection over union with other
+        (self by default).'''
+        a = self.normalized().coords
+        b = a if other is None else other.normalized().coords
+        x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+        y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+        x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+        y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+        inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+        area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+        area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+        union = area_a[:, None] + area_b[None, :] - inter
+        return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+    def overlapping_pairs(self, max_cells=16):
+        '''The sorted pairs (i, j), i < j, of the boxes which overlap (or
+        touch).
+
+        The boxes are bucketed by the cells of a grid as large as the median
+        box, only the boxes sharing a cell are compared: a column of boxes
+        is not n**2 pairs. The boxes covering more than max_cells cells are
+        compared with every box.
+        '''
+        c = self.normalized().coords
+        n = len(c)
+        if n < 2:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        cell = float(np.median(np.maximum(c[:, 2] - c[:, 0], c[:, 3] - c[:, 1]))) or 1.0
+        first = np.floor(c[:, :2] / cell).astype(np.int64)
+        spans = np.floor(c[:, 2:] / cell).astype(np.int64) - first + 1
+        counts = spans[:, 0] * spans[:, 1]
+        large = counts > max_cells
+        # One entry (column, row, box) per cell covered by a small box
+        small = np.flatnonzero(~large)
+        box = np.repeat(small, counts[small])
+        offset = _ranks(counts[small])
+        column = first[box, 0] + offset % spans[box, 0]
+        row = first[box, 1] + offset // spans[box, 0]
+        order = np.lexsort((box, row, column))
+        column, row, box = column[order], row[order], box[order]
+        # Each entry with the later entries of its cell
+        starts = np.flatnonzero(np.r_[True, (column[1:] != column[:-1]) | (row[1:] != row[:-1])])
+        runs = np.diff(np.r_[starts, len(box)])
+        later = np.repeat(runs, runs) - _ranks(runs) - 1
+        a = np.repeat(np.arange(len(box)), later)
+        i, j = [box[a]], [box[a + 1 + _ranks(later)]]
+        for p in np.flatnonzero(large):  # Each pair of large boxes once
+            others = np.flatnonzero(~large | (np.arange(n) > p))
+            i.append(np.full(len(others), p))
+            j.append(others)
+        i, j = np.concatenate(i), np.concatenate(j)
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        overlap = ((c[i, 0] <= c[j, 2]) & (c[j, 0] <= c[i, 2])
+                   & (c[i, 1] <= c[j, 3]) & (c[j, 1] <= c[i, 3]) & (i != j))
+        codes = np.unique(i[overlap].astype(np.int64) * n + j[overlap])
+        return (codes // n).astype(np.intp), (codes % n).astype(np.intp)
+
+    def dedup(self, threshold=0.9, by_color=True):
+        '''Drop the boxes overlapping an earlier kept one by more than
+        threshold (IoU), like a non-maximum suppression where the older
+        box wins.
+
+        :param by_color: Only compare the boxes of the same color.
+        '''
+        a = self.normalized().coords
+        area = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+        removed = np.zeros(len(a), dtype=bool)
+        if threshold < 1:  # The copies of a box go first, without their n**2 pairs
+            copies = np.flatnonzero(area > 0)
+            keys = a[copies]
+            if by_color:
+                keys = np.column_stack([keys, self.labels[copies, 0]])
+            _, first = np.unique(keys, axis=0, return_index=True)
+            removed[copies] = True
+            removed[copies[first]] = False
+        kept = np.flatnonzero(~removed)
+        i, j = self[kept].overlapping_pairs()
+        i, j = kept[i], kept[j]
+        if by_color:
+            same = self.labels[i, 0] == self.labels[j, 0]
+            i, j = i[same], j[same]
+        x0 = np.maximum(a[i, 0], a[j, 0])
+        y0 = np.maximum(a[i, 1], a[j, 1])
+        x1 = np.minimum(a[i, 2], a[j, 2])
+        y1 = np.minimum(a[i, 3], a[j, 3])
+        inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+        union = area[i] + area[j] - inter
+        iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        duplicates = {}  # i -> the later boxes it suppresses
+        for k, later in zip(i[iou > threshold].tolist(), j[iou > threshold].tolist()):
+            duplicates.setdefault(k, []).append(later)
+        for k in sorted(duplicates):  # Only a kept box suppresses
+            if not removed[k]:
+                removed[duplicates[k]] = True
+        return self[~removed]
+
+
+def _plain(bbox):
+    return [int(v) if v.is_integer() else v for v in bbox]
+
+
+def _ranks(counts):
+    '''0, 1, ..., counts[0]-1, 0, 1, ..., counts[1]-1, ...'''
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
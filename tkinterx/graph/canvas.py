@@ -1,11 +1,27 @@
 '''Some of the actions related to the graph.
 '''
-from tkinter import Canvas, StringVar, ttk
+from tkinter import Canvas, StringVar, ttk, _stringify
+import time
+
+from .history import History
+from .model import GraphModel
+
+
+def flatten_direction(direction):
+    '''((x_0, y_0), (x_1, y_1)) or (x_0, y_0, x_1, y_1) -> [x_0, y_0, x_1, y_1]'''
+    coords = []
+    for v in direction:
+        if isinstance(v, (tuple, list)):
+            coords.extend(v)
+        else:
+            coords.append(v)
+    return coords
 
 
 class CanvasMeta(Canvas):
     '''Graphic elements are composed of line(segment), rectangle, ellipse, and arc.
     '''
+    graph_types = 'rectangle', 'oval', 'line', 'arc', 'polygon'
 
     def __init__(self, master=None, cnf={}, **kw):
         '''The base class of all graphics frames.
@@ -13,6 +29,10 @@ class CanvasMeta(Canvas):
         :param master: a widget of tkinter or tkinter.ttk.
         '''
         super().__init__(master, cnf, **kw)
+        # graph_type -> create method, instead of eval per graph
+        self._creators = {graph_type: getattr(self, f"create_{graph_type}")
+                          for graph_type in self.graph_types}
+        self.draw_stats = {'count': 0, 'batches': 0, 'seconds': 0}
 
     def layout(self, row=0, column=0):
         '''Layout graphic elements with Grid'''
@@ -45,11 +65,20 @@ class CanvasMeta(Canvas):
 
         :return: Unique identifier solely for graphic elements.
         '''
+        kwargs = self._graph_options(graph_type, color, width, tags, **kwargs)
+        graph_id = self._creators[graph_type](*direction, **kwargs)
+        return graph_id
+
+    @staticmethod
+    def default_tags(graph_type, color):
+        if graph_type in ('rectangle', 'oval', 'line', 'arc'):
+            return f"{color} {graph_type}"
+        else:
+            return f'{color} graph'
+
+    def _graph_options(self, graph_type, color='blue', width=1, tags=None, **kwargs):
         if tags is None:
-            if graph_type in ('rectangle', 'oval', 'line', 'arc'):
-                tags = f"{color} {graph_type}"
-            else:
-                tags = f'{color} graph'
+            tags = self.default_tags(graph_type, color)
 
         com_kw = {'width': width, 'tags': tags}
         kw = {**com_kw, 'outline': color}
@@ -58,9 +87,49 @@ class CanvasMeta(Canvas):
             kwargs.update(line_kw)
         else:
             kwargs.update(kw)
-        func = eval(f"self.create_{graph_type}")
-        graph_id = func(*direction, **kwargs)
-        return graph_id
+        return kwargs
+
+    def _graph_command(self, graph_type, direction, color='blue', width=1, tags=None, **kwargs):
+        '''The Tcl command of `draw_graph`.'''
+        if graph_type not in self._creators:
+            raise KeyError(graph_type)
+        kwargs = self._graph_options(graph_type, color, width, tags, **kwargs)
+        args = [_stringify(v) for v in flatten_direction(direction)]
+        for key, value in kwargs.items():
+            if value is not None:
+                args.append(f"-{key.rstrip('_')} {_stringify(value)}")
+        return f"[{self._w} create {graph_type} {' '.join(args)}]"
+
+    def draw_graphs(self, params, chunk=4096):
+        '''Draw many graphic elements, `chunk` of them per Tcl evaluation.
+
+        :param params: An iterable of dict, the parameters of `draw_graph`,
+            `bunch2params(boxes).values()` for example.
+        :param chunk: The number of graphic elements per Tcl script.
+
+        :return: The identifiers of the graphic elements. The timing of the
+            call is kept in `draw_stats`.
+        '''
+        start = time.perf_counter()
+        graph_ids = []
+        commands = []
+        batches = 0
+        for param in params:
+            commands.append(self._graph_command(**param))
+            if len(commands) == chunk:
+                graph_ids.extend(self._eval_commands(commands))
+                commands = []
+                batches += 1
+        if commands:
+            graph_ids.extend(self._eval_commands(commands))
+            batches += 1
+        self.draw_stats = {'count': len(graph_ids), 'batches': batches,
+                           'seconds': time.perf_counter() - start}
+        return graph_ids
+
+    def _eval_commands(self, commands):
+        result = self.tk.eval(f"list {' '.join(commands)}")
+        return [int(graph_id) for graph_id in self.tk.splitlist(result)]
 
 
 class GraphMeta(dict):
@@ -91,19 +160,22 @@ class SimpleGraph(CanvasMeta):
     def draw(self, direction, width=1, tags=None, **kw):
         return self.draw_graph(self.shape, direction, color=self.color, width=width, tags=tags, **kw)
 
+    def _params(self, directions, width=1, tags=None, **kw):
+        for direction in directions:
+            yield {'graph_type': self.shape, 'direction': direction,
+                   'color': self.color, 'width': width, 'tags': tags, **kw}
+
     def add_row(self, direction, num, stride=10, width=1, tags=None, **kw):
         x0, y0, x1, y1 = direction
         stride = x1 - x0 + stride
-        for k in range(num):
-            direction = [x0+stride*k, y0, x1+stride*k, y1]
-            self.draw(direction, width=width, tags=tags, **kw)
+        directions = [[x0+stride*k, y0, x1+stride*k, y1] for k in range(num)]
+        return self.draw_graphs(self._params(directions, width, tags, **kw))
 
     def add_column(self, direction, num, stride=5, width=1, tags=None, **kw):
         x0, y0, x1, y1 = direction
         stride = y1 - y0 + stride
-        for k in range(num):
-            direction = [x0, y0+stride*k, x1, y1+stride*k]
-            self.draw(direction, width=width, tags=tags, **kw)
+        directions = [[x0, y0+stride*k, x1, y1+stride*k] for k in range(num)]
+        return self.draw_graphs(self._params(directions, width, tags, **kw))
 
 
 class Drawing(CanvasMeta):
@@ -126,15 +198,22 @@ class Drawing(CanvasMeta):
     root.mainloop()
     '''
 
+    preview_time = 16  # The least interval (ms) between two updates of the preview
+    history_limit = 1000  # The edits which can be undone
+
     def __init__(self, master, selector_frame, after_time=160, cnf={}, **kw):
         '''Click the left mouse button to start painting, release
             the left mouse button to complete the painting.
 
         :param selector: The graphics selector, which is an instance of Selector.
+        :param after_time: Kept for compatibility, the drawing no longer waits.
+            See `preview_time`.
         '''
         super().__init__(master, cnf, **kw)
         self.selector_frame = selector_frame
         self.after_time = after_time
+        self.model = GraphModel()  # The graphs, without the temporary ones
+        self.history = History(self, self.history_limit)
         self.x = self.y = 0
         self.reset()
         self._draw_bind()
@@ -143,6 +222,9 @@ class Drawing(CanvasMeta):
         self.first_x, self.first_y = 0, 0
         self.last_x, self.last_y = 0, 0
         self.on = False  # Used to record whether a painting is being made
+        self._preview_id = None  # The one dashed graph following the mouse
+        self._preview_job = None
+        self._motion_event = None
 
     def update_xy(self, event):
         '''Press the left mouse button to record the coordinates of the left mouse button'''
@@ -167,16 +249,34 @@ class Drawing(CanvasMeta):
     def mouse_draw(self, event):
         '''Release the left mouse button to finish painting.'''
         self.configure(cursor="arrow")
-        self.after(self.after_time)
         bbox = self.get_bbox(event)
         self.create_graph(bbox)
 
     def mouse_move(self, event):
+        '''Keep the latest motion only, the preview is updated at most
+        once every `preview_time` ms without blocking the event loop.'''
         self.on = True
-        self.mouse_draw(event)
+        self._motion_event = event
+        if self._preview_job is None:
+            self._preview_job = self.after(self.preview_time, self.update_preview)
+
+    def update_preview(self):
+        self._preview_job = None
+        if not self.on:
+            return
+        bbox = self.get_bbox(self._motion_event)
+        if self._preview_id is None:
+            self._preview_id = self.create_graph(bbox)
+        else:
+            self.coords(self._preview_id, *bbox)
 
     def mouse_release(self, event):
-        self.delete('temp')
+        if self._preview_job is not None:
+            self.after_cancel(self._preview_job)
+            self._preview_job = None
+        if self._preview_id is not None:
+            self.delete(self._preview_id)
+            self._preview_id = None
         self.on = False
         self.mouse_draw(event)
 
@@ -203,17 +303,76 @@ class Drawing(CanvasMeta):
         if cond1 or cond2:
             return
         else:
-            return self.draw_graph(shape.split('_')[0], **kw)
+            graph_id = self.draw_graph(shape.split('_')[0], **kw)
+            if not self.on:  # Not a preview
+                self.history.created([graph_id])
+            return graph_id
 
     def tune_graph(self, event):
         '''Release the left mouse button to finish painting.'''
         self.configure(cursor="arrow")
         x0, y0, x1, y1 = self.get_bbox(event)
-        current_graph_id = self.find_withtag('current')
-        graph_id = current_graph_id if current_graph_id else self.find_closest(
-            x0, y0)
-        bbox = self.bbox(graph_id)
-        self.coords(graph_id, *bbox[:2], x1, y1)
+        graph_id = self.model.nearest(x0, y0)
+        if graph_id is None:
+            return
+        bbox = self.model.coords(graph_id)
+        self.history.set_coords(graph_id, (*bbox[:2], x1, y1))
+
+    def _register(self, graph_id, graph_type, direction, color='blue', tags=None, **kw):
+        if tags is None:
+            tags = self.default_tags(graph_type, color)
+        if isinstance(tags, str):
+            tags = tags.split()
+        if 'temp' not in tags:
+            self.model.add(graph_id, tags, flatten_direction(direction))
+
+    def draw_graph(self, graph_type, direction, color='blue', width=1, tags=None, **kwargs):
+        graph_id = super().draw_graph(graph_type, direction, color, width, tags, **kwargs)
+        self._register(graph_id, graph_type, direction, color, tags)
+        return graph_id
+
+    def draw_graphs(self, params, chunk=4096):
+        params = list(params)
+        graph_ids = super().draw_graphs(params, chunk)
+        for graph_id, param in zip(graph_ids, params):
+            self._register(graph_id, **param)
+        return graph_ids
+
+    def _find(self, tagOrId):
+        if isinstance(tagOrId, int):
+            return [tagOrId]
+        if isinstance(tagOrId, (tuple, list)):
+            return [graph_id for item in tagOrId for graph_id in self._find(item)]
+        if tagOrId == 'all':
+            return list(self.model)
+        return self.find_withtag(tagOrId)
+
+    def delete(self, *args):
+        '''Delete the items of the canvas and of the model.'''
+        for tagOrId in args:
+            self.model.remove(self._find(tagOrId))
+        super().delete(*args)
+
+    def move(self, tagOrId, xAmount, yAmount):
+        self.model.move(self._find(tagOrId), xAmount, yAmount)
+        super().move(tagOrId, xAmount, yAmount)
+
+    def scale(self, tagOrId, xOrigin, yOrigin, xScale, yScale):
+        self.model.scale(self._find(tagOrId), xOrigin, yOrigin, xScale, yScale)
+        super().scale(tagOrId, xOrigin, yOrigin, xScale, yScale)
+
+    def coords(self, tagOrId, *args):
+        if args:
+            graph_ids = self._find(tagOrId)
+            if graph_ids:
+                self.model.set_coords(graph_ids[0], flatten_direction(args))
+        return super().coords(tagOrId, *args)
+
+    def undo(self, *args):
+        self.history.undo()
+
+    def redo(self, *args):
+        self.history.redo()
 
     def get_xy(self, event):
         self.configure(cursor="target")
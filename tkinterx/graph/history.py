@@ -0,0 +1,209 @@
+'''Undo and redo the edits of a Drawing.
+'''
+from collections import deque
+import time
+
+from .records import GraphTable, Vocabulary
+from .shapes import bunch2params
+
+
+class History:
+    '''A bounded log of the edits of a Drawing, as small deltas.
+
+    A move keeps only its offset, a change of coordinates the old and the
+    new coordinates, a creation or a deletion the tags and the coordinates
+    of its graphs in a GraphTable (arrays, not a dict per graph). Undoing a deletion redraws all its graphs by one
+    `draw_graphs` call, so undoing "clear all" is one batch however many
+    graphs it removed.
+
+    The graphs recreated by undo/redo get new canvas identifiers, the log
+    refers to each graph by a stable key (its first identifier) instead.
+
+    The coordinates and the offsets are kept at zoom 1 (the drawing is zoomed
+    around the origin, see `ScrollableDrawing.zoom_by`) and scaled to the
+    zoom of the drawing when applied, so an undo after a zoom lands where
+    the graph is on the picture.
+
+    Example
+    ======================
+    history = History(drawing, limit=1000)
+    history.move([graph_id], 0, -1)  # Moves and records
+    history.move([graph_id], 0, -1)  # Coalesced with the previous move
+    history.delete(list(drawing.model))
+    history.undo()  # The graphs are back
+    history.undo()  # Moved back by (0, 2)
+    '''
+
+    def __init__(self, drawing, limit=1000, coalesce_time=1):
+        '''
+        :param drawing: An instance of Drawing, its model gives the graphs.
+        :param limit: The maximum number of edits kept, the oldest are dropped.
+        :param coalesce_time: The successive moves of the same graphs closer
+            than this (seconds) are recorded as one edit.
+        '''
+        self.drawing = drawing
+        self.coalesce_time = coalesce_time
+        self._undo = deque(maxlen=limit)
+        self._redo = []
+        self._fills = {}  # key -> the fill color, set by `fill`
+        self._ids = {}  # key -> current graph id, when they differ
+        self._keys = {}  # current graph id -> key
+        self._colors, self._shapes = Vocabulary(), Vocabulary()  # Of the snapshots
+        self.version = 0  # Changed by every edit, undo and redo
+
+    def clear(self):
+        '''Forget everything, for example when another picture is shown.'''
+        self._undo.clear()
+        self._redo.clear()
+        self._fills.clear()
+        self._ids.clear()
+        self._keys.clear()
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def _key(self, graph_id):
+        return self._keys.get(graph_id, graph_id)
+
+    def _id(self, key):
+        return self._ids.get(key, key)
+
+    def _unzoom(self, coords):
+        zoom = getattr(self.drawing, 'zoom', 1)  # Only a ScrollableDrawing zooms
+        return tuple(coords) if zoom == 1 else tuple(v / zoom for v in coords)
+
+    def _zoom(self, coords):
+        zoom = getattr(self.drawing, 'zoom', 1)
+        return tuple(coords) if zoom == 1 else tuple(v * zoom for v in coords)
+
+    def _push(self, entry):
+        self._undo.append(entry)
+        self._redo.clear()
+        self.version += 1
+
+    def _snapshot(self, graph_ids):
+        '''key -> the graph as a GraphTable, and key -> its fill color.'''
+        model = self.drawing.model
+        table, fills = GraphTable(self._colors, self._shapes), {}
+        for graph_id in graph_ids:
+            if graph_id in model:
+                key = self._key(graph_id)
+                table.append(key, model.tags(graph_id), self._unzoom(model.coords(graph_id)))
+                if key in self._fills:
+                    fills[key] = self._fills[key]
+        return table, fills
+
+    def _draw(self, table, fills):
+        params = []
+        for key, param in bunch2params(table).items():
+            param['direction'] = self._zoom(param['direction'])
+            if key in fills:
+                param['fill'] = fills[key]
+            params.append(param)
+        for key, graph_id in zip(table.ids, self.drawing.draw_graphs(params)):
+            self._keys.pop(self._ids.get(key), None)
+            self._ids[key] = graph_id
+            self._keys[graph_id] = key
+
+    def _move(self, graph_ids, x, y):
+        for graph_id in graph_ids:  # Tk moves one tag or identifier per call
+            self.drawing.move(graph_id, x, y)
+
+    def _erase(self, keys):
+        graph_ids = [self._id(key) for key in keys]
+        if graph_ids:
+            self.drawing.delete(*graph_ids)
+
+    # The edits, each one is applied then recorded
+
+    def created(self, graph_ids):
+        '''Record graphs which were just drawn.'''
+        table, fills = self._snapshot(graph_ids)
+        if table:
+            self._push(('create', table, fills))
+
+    def delete(self, graph_ids):
+        table, fills = self._snapshot(graph_ids)
+        self._erase(table.ids)
+        if table:
+            self._push(('delete', table, fills))
+
+    def move(self, graph_ids, x, y):
+        keys = tuple(self._key(graph_id) for graph_id in graph_ids)
+        self._move(graph_ids, x, y)
+        x, y = self._unzoom((x, y))
+        now = time.monotonic()
+        if self._undo and not self._redo:
+            kind, *last = self._undo[-1]
+            if kind == 'move' and last[0] == keys and now - last[3] < self.coalesce_time:
+                self._undo[-1] = ('move', keys, last[1] + x, last[2] + y, now)
+                self.version += 1
+                return
+        self._push(('move', keys, x, y, now))
+
+    def set_coords(self, graph_id, coords):
+        old = self._unzoom(self.drawing.model.coords(graph_id))
+        self.drawing.coords(graph_id, *coords)
+        self._push(('coords', self._key(graph_id), old,
+                    self._unzoom(self.drawing.model.coords(graph_id))))
+
+    def fill(self, graph_id, color):
+        key = self._key(graph_id)
+        old = self._fills.get(key)
+        self._set_fill(key, color)
+        self._push(('fill', key, old, color))
+
+    def _set_fill(self, key, color):
+        self.drawing.itemconfigure(self._id(key), fill=color or '')
+        if color:
+            self._fills[key] = color
+        else:
+            self._fills.pop(key, None)
+
+    def _apply(self, entry, reverse):
+        kind, *args = entry
+        if kind in ('create', 'delete'):
+            table, fills = args
+            if (kind == 'create') == reverse:
+                self._erase(table.ids)
+            else:
+                self._draw(table, fills)
+        elif kind == 'move':
+            keys, x, y, _ = args
+            sign = -1 if reverse else 1
+            x, y = self._zoom((sign*x, sign*y))
+            self._move([self._id(key) for key in keys], x, y)
+        elif kind == 'coords':
+            key, old, new = args
+            self.drawing.coords(self._id(key), *self._zoom(old if reverse else new))
+        elif kind == 'fill':
+            key, old, new = args
+            self._set_fill(key, old if reverse else new)
+
+    def undo(self):
+        '''Revert the last edit, return False if there is none.'''
+        if not self._undo:
+            return False
+        entry = self._undo.pop()
+        self._apply(entry, reverse=True)
+        self._redo.append(entry)
+        self.version += 1
+        return True
+
+    def redo(self):
+        '''Apply again the last undone edit, return False if there is none.'''
+        if not self._redo:
+            return False
+        entry = self._redo.pop()
+        self._apply(entry, reverse=False)
+        self._undo.append(entry)
+        self.version += 1
+        return True
+
+    def __len__(self):
+        return len(self._undo)
@@ -0,0 +1,136 @@
+'''The Python side copy of the graphs drawn on a canvas.
+'''
+from .spatial import GridIndex, coords2bbox
+
+
+class GraphModel:
+    '''Record the tags and the coordinates of each graph by its identifier.
+
+    The canvas keeps it up to date when the graphs are created, moved, tuned
+    or deleted, so saving and querying never go through Tk.
+
+    Example
+    ======================
+    model = GraphModel()
+    model.add(1, ('blue', 'rectangle'), (0, 0, 10, 10))
+    model.move([1], 5, 0)
+    model.to_graph('rectangle')  # {1: {'tags': ('blue', 'rectangle'), 'bbox': (5, 0, 15, 10)}}
+    model.nearest(20, 5)  # 1
+    '''
+
+    def __init__(self, cell=64):
+        '''
+        :param cell: The cell size of the spatial index.
+        '''
+        self._tags = {}  # graph_id -> tuple of tags
+        self._coords = {}  # graph_id -> (x_0, y_0, x_1, y_1, ...)
+        self.index = GridIndex(cell)
+        self._bounds = None  # The union of the bounding boxes, None if unknown
+
+    def add(self, graph_id, tags, coords):
+        if isinstance(tags, str):
+            tags = tags.split()
+        self._tags[graph_id] = tuple(tags)
+        self._set(graph_id, coords)
+
+    def _set(self, graph_id, coords):
+        coords = tuple(coords)
+        old = self._coords.get(graph_id)
+        self._coords[graph_id] = coords
+        bbox = coords2bbox(coords)
+        self.index.insert(graph_id, bbox)
+        if old is not None:  # May shrink the bounds
+            self._bounds = None
+        elif self._bounds is not None:
+            b = self._bounds
+            self._bounds = (min(b[0], bbox[0]), min(b[1], bbox[1]),
+                            max(b[2], bbox[2]), max(b[3], bbox[3]))
+
+    def bounds(self):
+        '''The union of the bounding boxes, None without graphs.
+
+        Extended on each addition, recomputed lazily after the other changes.
+        '''
+        if self._bounds is None and self._coords:
+            bboxes = [coords2bbox(coords) for coords in self._coords.values()]
+            self._bounds = (min(b[0] for b in bboxes), min(b[1] for b in bboxes),
+                            max(b[2] for b in bboxes), max(b[3] for b in bboxes))
+        return self._bounds
+
+    def remove(self, graph_ids):
+        self._bounds = None
+        for graph_id in graph_ids:
+            self._tags.pop(graph_id, None)
+            self._coords.pop(graph_id, None)
+            self.index.remove(graph_id)
+
+    def clear(self):
+        self._tags.clear()
+        self._coords.clear()
+        self.index.clear()
+        self._bounds = None
+
+    def move(self, graph_ids, x, y):
+        for graph_id in graph_ids:
+            coords = self._coords.get(graph_id)
+            if coords is not None:
+                self._set(graph_id, (v + (y if k % 2 else x)
+                                     for k, v in enumerate(coords)))
+
+    def scale(self, graph_ids, x, y, x_scale, y_scale):
+        '''Like Canvas.scale, around (x, y).'''
+        for graph_id in graph_ids:
+            coords = self._coords.get(graph_id)
+            if coords is not None:
+                self._set(graph_id, (y + (v-y)*y_scale if k % 2 else x + (v-x)*x_scale
+                                     for k, v in enumerate(coords)))
+
+    def set_coords(self, graph_id, coords):
+        if graph_id in self._coords:
+            self._set(graph_id, coords)
+
+    def nearest(self, x, y):
+        '''The closest graph, None if there is none (the picture is never a graph).'''
+        return self.index.nearest(x, y)
+
+    def find_at(self, x, y):
+        return self.index.find_at(x, y)
+
+    def find_overlapping(self, bbox):
+        return self.index.find_overlapping(coords2bbox(bbox))
+
+    def extent(self, graph_id):
+        '''(width, height) of the bounding box.'''
+        x0, y0, x1, y1 = coords2bbox(self._coords[graph_id])
+        return x1 - x0, y1 - y0
+
+    def coords(self, graph_id):
+        return self._coords[graph_id]
+
+    def tags(self, graph_id):
+        return self._tags[graph_id]
+
+    def color(self, graph_id):
+        return self._tags[graph_id][0]
+
+    def find_withtag(self, tag):
+        '''The identifiers of tag, 'all' or an identifier like Tk.'''
+        if tag == 'all':
+            return list(self._tags)
+        if tag in self._tags:
+            return [tag]
+        return [graph_id for graph_id, tags in self._tags.items() if tag in tags]
+
+    def to_graph(self, tag='all'):
+        '''The layout of `get_graph`: {graph_id: {'tags': ..., 'bbox': ...}}'''
+        return {graph_id: {'tags': self._tags[graph_id], 'bbox': self._coords[graph_id]}
+                for graph_id in self.find_withtag(tag)}
+
+    def __contains__(self, graph_id):
+        return graph_id in self._tags
+
+    def __len__(self):
+        return len(self._tags)
+
+    def __iter__(self):
+        return iter(self._tags)
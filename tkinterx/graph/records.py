@@ -0,0 +1,172 @@
+'''Compact storage of many graphs: one struct of arrays per picture instead of
+two dicts, a tuple and a list per graph.
+
+`python -m tkinterx.graph.records` prints the memory saved on a synthetic
+project.
+'''
+from array import array
+from collections.abc import Mapping
+import sys
+import tracemalloc
+
+
+class Vocabulary:
+    '''Intern names as small ints, shared by many GraphTable.
+
+    Example
+    ======================
+    colors = Vocabulary()
+    colors.intern('blue')  # 0
+    colors.names[0]  # 'blue'
+    '''
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name):
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def __len__(self):
+        return len(self.names)
+
+
+class GraphTable(Mapping):
+    '''The graphs of one picture as parallel arrays, a read-only mapping
+    graph_id -> {'tags': [color, shape], 'bbox': [...]} like `get_graph`.
+
+    The coordinates are 8-byte floats with a 1-byte flag telling whether
+    they were int, so `from_graph(graph).to_graph() == graph` with the same
+    JSON text. The colors and the shapes are 2-byte ids into vocabularies
+    shared by all the tables of a project. The tags which are not a pair
+    (color, shape) are kept aside as they are.
+
+    The History of a drawing keeps the graphs of its creations and deletions
+    in GraphTable.
+
+    Example
+    ======================
+    colors, shapes = Vocabulary(), Vocabulary()
+    table = GraphTable.from_graph(store['a.jpg'], colors, shapes)
+    table['1']  # {'tags': ['blue', 'rectangle'], 'bbox': [0, 0, 5, 5]}
+    drawing.draw_graphs(bunch2params(table).values())
+    '''
+    __slots__ = ('colors', 'shapes', 'ids', 'labels', 'coords', 'ints', 'offsets',
+                 'extra', '_rows')
+
+    def __init__(self, colors=None, shapes=None):
+        self.colors = Vocabulary() if colors is None else colors
+        self.shapes = Vocabulary() if shapes is None else shapes
+        self.ids = []  # graph ids, in order
+        self.labels = array('H')  # color_id, shape_id of each graph
+        self.coords = array('d')
+        self.ints = array('B')  # 1 if the coordinate was an int
+        self.offsets = array('L', [0])  # The coordinates of graph k: offsets[k:k+2]
+        self.extra = {}  # row -> the tags which are not (color, shape)
+        self._rows = None  # graph_id -> row, built on the first lookup
+
+    @classmethod
+    def from_graph(cls, graph, colors=None, shapes=None):
+        table = cls(colors, shapes)
+        for graph_id, cats in graph.items():
+            table.append(graph_id, cats['tags'], cats['bbox'])
+        return table
+
+    def append(self, graph_id, tags, bbox):
+        if len(tags) != 2:
+            self.extra[len(self.ids)] = tuple(tags)
+        color, shape = (tuple(tags) + ('', ''))[:2]
+        # The same few ids ('1', '2'...) repeat in every picture
+        self.ids.append(sys.intern(graph_id) if isinstance(graph_id, str) else graph_id)
+        self.labels.append(self.colors.intern(color))
+        self.labels.append(self.shapes.intern(shape))
+        self.coords.extend(bbox)
+        self.ints.extend(isinstance(v, int) for v in bbox)
+        self.offsets.append(len(self.coords))
+        self._rows = None
+
+    def _bbox(self, row):
+        start, end = self.offsets[row], self.offsets[row+1]
+        return [int(v) if is_int else v
+                for v, is_int in zip(self.coords[start:end], self.ints[start:end])]
+
+    def _tags(self, row):
+        if row in self.extra:
+            return list(self.extra[row])
+        return [self.colors.names[self.labels[2*row]], self.shapes.names[self.labels[2*row+1]]]
+
+    def __getitem__(self, graph_id):
+        if self._rows is None:
+            self._rows = {graph_id: row for row, graph_id in enumerate(self.ids)}
+        row = self._rows[graph_id]
+        return {'tags': self._tags(row), 'bbox': self._bbox(row)}
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def to_graph(self):
+        '''The JSON layout of `get_graph`.'''
+        return {graph_id: {'tags': self._tags(row), 'bbox': self._bbox(row)}
+                for row, graph_id in enumerate(self.ids)}
+
+    def iter_shapes(self):
+        '''Yield (graph_id, tags, bbox), see `shapes.iter_shapes`.'''
+        for row, graph_id in enumerate(self.ids):
+            yield graph_id, self._tags(row), self._bbox(row)
+
+    def histogram(self, category='color'):
+        '''The number of graphs of each color (or shape).'''
+        position = 0 if category == 'color' else 1
+        names = (self.colors if category == 'color' else self.shapes).names
+        counts = {}
+        for label_id in self.labels[position::2]:
+            counts[names[label_id]] = counts.get(names[label_id], 0) + 1
+        return counts
+
+
+def compact_bunch(bunch):
+    '''image name -> GraphTable, with shared vocabularies. The other values
+    (like 'root') are kept as they are.'''
+    colors, shapes = Vocabulary(), Vocabulary()
+    return {name: GraphTable.from_graph(graph, colors, shapes)
+            if isinstance(graph, Mapping) else graph
+            for name, graph in bunch.items()}
+
+
+def memory_benchmark(num_images=2000, num_graphs=100):
+    '''The bytes allocated by a project held as dicts and as GraphTable.'''
+    colors = ['blue', 'red', 'green', 'yellow']
+    shapes = ['rectangle', 'oval_point', 'rectangle_point']
+
+    def make_bunch():
+        return {f"{k:06d}.jpg": {str(g): {'tags': [colors[g % 4], shapes[g % 3]],
+                                          'bbox': [g + 0.5, g, g + 30.25, g + 20]}
+                                 for g in range(num_graphs)}
+                for k in range(num_images)}
+
+    tracemalloc.start()
+    bunch = make_bunch()
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    tables = compact_bunch(make_bunch())
+    table_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert tables[next(iter(bunch))].to_graph() == bunch[next(iter(bunch))]
+    return {'graphs': num_images * num_graphs, 'dict_bytes': dict_bytes,
+            'table_bytes': table_bytes, 'ratio': dict_bytes / table_bytes}
+
+
+if __name__ == '__main__':
+    stats = memory_benchmark()
+    print(f"{stats['graphs']} graphs: {stats['dict_bytes']/2**20:.1f} MiB as dicts, "
+          f"{stats['table_bytes']/2**20:.1f} MiB as GraphTable ({stats['ratio']:.1f}x smaller)")
@@ -0,0 +1,26 @@
+'''The graphs in the layout of `get_graph`,
+{graph_id: {'tags': [color, shape], 'bbox': [x_0, y_0, x_1, y_1, ...]}},
+whether they are dicts or arrays (BoxArray, GraphTable).
+'''
+
+
+def iter_shapes(graph):
+    '''Yield (graph_id, tags, coords) of each graph.
+
+    :param graph: A dict in the layout of `get_graph`, or an object with an
+        `iter_shapes` method (BoxArray, GraphTable) which reads its arrays
+        without building the dicts.
+    '''
+    if hasattr(graph, 'iter_shapes'):
+        return graph.iter_shapes()
+    return ((graph_id, cats['tags'], cats['bbox']) for graph_id, cats in graph.items())
+
+
+def bunch2params(graph):
+    '''graph_id -> the parameters of `draw_graph`.'''
+    params = {}
+    for graph_id, tags, coords in iter_shapes(graph):
+        color, shape = tags[:2]
+        params[graph_id] = {'tags': tags, 'color': color,
+                            'graph_type': shape.split('_')[0], 'direction': coords}
+    return params
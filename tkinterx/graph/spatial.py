@@ -0,0 +1,157 @@
+'''A uniform grid over the bounding boxes of the graphs, for hit-testing.
+'''
+from collections import defaultdict
+from math import floor, hypot, inf
+
+
+def coords2bbox(coords):
+    '''(x_0, y_0, x_1, y_1, ...) -> (min x, min y, max x, max y)'''
+    xs, ys = coords[0::2], coords[1::2]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def distance(x, y, bbox):
+    '''The distance from (x, y) to the bbox, 0 inside.'''
+    x0, y0, x1, y1 = bbox
+    dx = max(x0 - x, 0, x - x1)
+    dy = max(y0 - y, 0, y - y1)
+    return hypot(dx, dy)
+
+
+class GridIndex:
+    '''Bucket the bounding boxes by the cells of a uniform grid.
+
+    The boxes covering more than `max_cells` cells are kept apart and scanned
+    linearly, they are few and would fill too many cells.
+
+    Example
+    ======================
+    index = GridIndex(cell=64)
+    index.insert(1, (0, 0, 10, 10))
+    index.insert(2, (100, 100, 120, 130))
+    index.nearest(90, 90)  # 2
+    index.find_at(5, 5)  # [1]
+    index.find_overlapping((0, 0, 200, 200))  # [1, 2]
+    '''
+
+    def __init__(self, cell=64, max_cells=256):
+        self.cell = cell
+        self.max_cells = max_cells
+        self._cells = defaultdict(set)  # (i, j) -> graph ids
+        self._bboxes = {}  # graph_id -> bbox
+        self._large = set()
+        self._extent = None  # The cells ever occupied: (i_0, j_0, i_1, j_1)
+
+    def _cell_range(self, bbox):
+        x0, y0, x1, y1 = bbox
+        cell = self.cell
+        return floor(x0/cell), floor(y0/cell), floor(x1/cell), floor(y1/cell)
+
+    def insert(self, graph_id, bbox):
+        if graph_id in self._bboxes:
+            self.remove(graph_id)
+        self._bboxes[graph_id] = bbox
+        i0, j0, i1, j1 = self._cell_range(bbox)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > self.max_cells:
+            self._large.add(graph_id)
+            return
+        if self._extent is None:
+            self._extent = i0, j0, i1, j1
+        else:
+            e = self._extent
+            self._extent = min(e[0], i0), min(e[1], j0), max(e[2], i1), max(e[3], j1)
+        for i in range(i0, i1+1):
+            for j in range(j0, j1+1):
+                self._cells[i, j].add(graph_id)
+
+    def remove(self, graph_id):
+        bbox = self._bboxes.pop(graph_id, None)
+        if bbox is None:
+            return
+        if graph_id in self._large:
+            self._large.discard(graph_id)
+            return
+        i0, j0, i1, j1 = self._cell_range(bbox)
+        for i in range(i0, i1+1):
+            for j in range(j0, j1+1):
+                ids = self._cells[i, j]
+                ids.discard(graph_id)
+                if not ids:
+                    del self._cells[i, j]
+
+    def clear(self):
+        self._cells.clear()
+        self._bboxes.clear()
+        self._large.clear()
+        self._extent = None
+
+    def _candidates(self, bbox):
+        i0, j0, i1, j1 = self._cell_range(bbox)
+        ids = set(self._large)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+            # A large query: walk the occupied cells instead
+            for (i, j), cell_ids in self._cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    ids |= cell_ids
+        else:
+            for i in range(i0, i1+1):
+                for j in range(j0, j1+1):
+                    ids |= self._cells.get((i, j), set())
+        return ids
+
+    def find_overlapping(self, bbox):
+        x0, y0, x1, y1 = bbox
+        return sorted(graph_id for graph_id in self._candidates(bbox)
+                      if self._overlap(self._bboxes[graph_id], x0, y0, x1, y1))
+
+    @staticmethod
+    def _overlap(bbox, x0, y0, x1, y1):
+        return bbox[0] <= x1 and x0 <= bbox[2] and bbox[1] <= y1 and y0 <= bbox[3]
+
+    def find_at(self, x, y):
+        '''The graphs whose bounding box contains (x, y).'''
+        return self.find_overlapping((x, y, x, y))
+
+    def _key(self, graph_id, x, y):
+        # The closest, then the smallest (the inner of nested boxes), then the newest
+        bbox = self._bboxes[graph_id]
+        area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+        return distance(x, y, bbox), area, -graph_id
+
+    def nearest(self, x, y, max_distance=inf):
+        '''The closest graph to (x, y), None if there is none within max_distance.'''
+        best, best_key = None, (max_distance, inf, inf)
+        for graph_id in self._large:
+            key = self._key(graph_id, x, y)
+            if key < best_key:
+                best, best_key = graph_id, key
+        if not self._cells:
+            return best
+        ci, cj = floor(x/self.cell), floor(y/self.cell)
+        i_min, j_min, i_max, j_max = self._extent
+        r_max = max(abs(ci - i_min), abs(ci - i_max), abs(cj - j_min), abs(cj - j_max))
+        for r in range(r_max + 1):
+            # Everything beyond ring r is at least r cells away
+            if best_key[0] <= (r - 1) * self.cell:
+                break
+            for i, j in self._ring(ci, cj, r):
+                for graph_id in self._cells.get((i, j), ()):
+                    key = self._key(graph_id, x, y)
+                    if key < best_key:
+                        best, best_key = graph_id, key
+        return best
+
+    @staticmethod
+    def _ring(ci, cj, r):
+        if r == 0:
+            yield ci, cj
+            return
+        for i in range(ci - r, ci + r + 1):
+            yield i, cj - r
+            yield i, cj + r
+        for j in range(cj - r + 1, cj + r):
+            yield ci - r, j
+            yield ci + r, j
+
+    def __len__(self):
+        return len(self._bboxes)
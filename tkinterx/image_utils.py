@@ -1,16 +1,581 @@
 from pathlib import Path
+from collections import OrderedDict
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from math import log2
 from PIL import Image, ImageTk
 
+from .metadata import (MetadataIndex, find_pictures, picture_extensions, probe_header,
+                       unbounded_pixels)
+
+
+def decode_image(path, size=None):
+    '''Open and fully decode a picture (safe to run outside the Tk thread).
+
+    :param size: (width, height), if given the picture is reduced to fit in it.
+        JPEG pictures are decoded at a reduced scale by `Image.draft`, the
+        others are shrunk by `Image.thumbnail`. The original size is kept
+        in `image.info['original_size']`.
+    '''
+    image = Image.open(path)
+    original_size = image.size
+    if size:
+        image.draft('RGB', size)  # Only JPEG supports it, no-op otherwise
+        image.thumbnail(size)
+    image.load()
+    image.info['original_size'] = original_size
+    return image
+
+
+def image_nbytes(image):
+    '''Estimate the memory of a PIL image or a Tk PhotoImage.'''
+    if hasattr(image, 'getbands'):
+        return image.width * image.height * len(image.getbands())
+    return image.width() * image.height() * 4
+
+
+class LRUCache:
+    '''A least recently used cache bounded by bytes instead of items.
+
+    Example
+    ======================
+    cache = LRUCache(max_bytes=2**20)
+    cache.put('a', image, image_nbytes(image))
+    cache.get('a')
+    cache.stats  # {'hits': 1, 'misses': 0, 'evictions': 0, ...}
+    '''
+
+    def __init__(self, max_bytes=256*2**20):
+        '''
+        :param max_bytes: The memory budget, 0 disables the cache.
+        '''
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (value, nbytes)
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+        self.misses += 1
+        return default
+
+    def put(self, key, value, nbytes):
+        if key in self._data:
+            self.nbytes -= self._data.pop(key)[1]
+        if nbytes > self.max_bytes:  # Never fits, do not flush everything else
+            return
+        self._data[key] = value, nbytes
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, (_, size) = self._data.popitem(last=False)
+            self.nbytes -= size
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        if key in self._data:
+            value, nbytes = self._data.pop(key)
+            self.nbytes -= nbytes
+            return value
+        return default
+
+    def clear(self):
+        self._data.clear()
+        self.nbytes = 0
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'items': len(self),
+                'nbytes': self.nbytes, 'max_bytes': self.max_bytes}
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class Prefetcher:
+    '''Decode the pictures around the current one in a thread pool.
+
+    Only PIL decoding happens in the workers, the `PhotoImage` conversion
+    stays on the Tk thread.
+
+    Example
+    ======================
+    prefetcher = Prefetcher(image_loader, num=2)
+    prefetcher.schedule(10, stride=5)  # decode 15, 20 then 5, 0
+    image = prefetcher.pop(image_loader.current_path)
+    '''
+
+    def __init__(self, loader, num=2, max_workers=2):
+        '''
+        :param loader: An instance of ImageLoader.
+        :param num: How many pictures to decode on each side.
+        :param max_workers: The size of the thread pool.
+        '''
+        self.loader = loader
+        self.num = num
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = {}  # path -> Future
+
+    def targets(self, index, stride=1):
+        '''The indexes to decode, the jump direction first.'''
+        n = len(self.loader)
+        if n == 0:
+            return []
+        index %= n
+        stride = stride or 1
+        ids = []
+        for sign in (1, -1):
+            for k in range(1, self.num+1):
+                i = index + sign*stride*k
+                if 0 <= i < n and i != index and i not in ids:
+                    ids.append(i)
+        return ids
+
+    def schedule(self, index, stride=1, first=()):
+        '''Cancel the stale work and submit the neighbours of index, after
+        the indexes of first.'''
+        ids = list(first)
+        ids += [i for i in self.targets(index, stride) if i not in ids]
+        paths = [self.loader.path(i) for i in ids]
+        self.cancel(keep=paths)
+        for path in paths:
+            if path not in self._futures and ('image', path) not in self.loader.cache:
+                self._futures[path] = self._executor.submit(
+                    self.loader.decode, path, self.loader.display_size)
+
+    def cancel(self, keep=()):
+        '''Drop every pending decode whose path is not in keep.'''
+        for path in list(self._futures):
+            if path not in keep:
+                self._futures.pop(path).cancel()
+
+    def pop(self, path):
+        '''Return the decoded picture of path, or None if it was not
+        prefetched or is still being decoded: the Tk thread never waits for
+        a worker, the caller decodes it.'''
+        future = self._futures.pop(path, None)
+        if future is None or not future.done() or future.cancelled():
+            if future is not None:
+                future.cancel()
+            return None
+        try:
+            return future.result()
+        except OSError:
+            return None
+
+    def shutdown(self):
+        '''Stop the workers, the pending decodes are dropped.'''
+        self.cancel()  # Every future is in _futures, cancel_futures needs Python 3.9
+        self._executor.shutdown(wait=False)
+
+
+class TiledImage:
+    '''Cut a picture in square tiles on each level of a pyramid.
+
+    The level k is the picture reduced by 2**k. JPEG levels are decoded
+    directly at their scale by draft (down to 1/8), so the coarse levels
+    never decode the full picture. The finer levels are decoded whole, so
+    only those from `min_level` (the first one which fits in level_bytes)
+    are shown: a gigapixel picture is zoomed from a reduced level instead.
+    The other formats have no reduced decoding in PIL (a compressed TIFF is
+    one libtiff block): their levels are reduced from the full picture, so
+    ImageLoader only tiles the formats of `supports`. The pictures are
+    opened above the decompression bomb limit of PIL, they are tiled on
+    purpose. At most two decoded levels are kept, the tiles go to an LRU
+    cache.
+
+    Example
+    ======================
+    tiled = TiledImage('huge.tif', tile_size=512)
+    level = tiled.fit_level((1000, 1000))
+    tiles = tiled.tiles_in(level, (0, 0, 1000, 800))  # [(level, i, j), ...]
+    tile = tiled.tile(tiles[0])  # A PIL image of at most 512x512
+    '''
+
+    draft_formats = ('JPEG',)  # Decoded at a reduced scale by `draft`
+
+    def __init__(self, path, tile_size=512, cache_bytes=128*2**20, level_bytes=256*2**20):
+        '''
+        :param level_bytes: The memory of the finest level decoded, see `min_level`.
+        '''
+        self.path = path
+        self.tile_size = tile_size
+        self.level_bytes = level_bytes
+        width, height, mode = probe_header(path)
+        self.size = width, height
+        self.bands = Image.getmodebands(mode or 'RGB')
+        self.format = self.open_format(path)
+        self.cache = LRUCache(cache_bytes)
+        self._levels = OrderedDict()  # level -> decoded picture
+
+    @staticmethod
+    def open_format(path):
+        '''The format of path, only the header is read.'''
+        with unbounded_pixels(), Image.open(path) as image:
+            return image.format
+
+    @classmethod
+    def supports(cls, path):
+        '''Whether the coarse levels of path are decoded without the full
+        picture.'''
+        return cls.open_format(path) in cls.draft_formats
+
+    @property
+    def max_level(self):
+        '''The first level which fits in one tile.'''
+        level = 0
+        while max(self.level_size(level)) > self.tile_size:
+            level += 1
+        return level
+
+    @property
+    def min_level(self):
+        '''The finest level decoded, the first one which fits in level_bytes.'''
+        level = 0
+        while level < self.max_level:
+            width, height = self.level_size(level)
+            if width * height * self.bands <= self.level_bytes:
+                break
+            level += 1
+        return level
+
+    def level_size(self, level):
+        factor = 2 ** level
+        width, height = self.size
+        return -(-width // factor), -(-height // factor)
+
+    def fit_level(self, size):
+        '''The finest level which fits in size, (width, height).'''
+        max_width, max_height = size
+        for level in range(self.min_level, self.max_level + 1):
+            width, height = self.level_size(level)
+            if width <= max_width and height <= max_height:
+                return level
+        return self.max_level
+
+    def level_image(self, level):
+        if level in self._levels:
+            self._levels.move_to_end(level)
+            return self._levels[level]
+        size = self.level_size(level)
+        if level == 0:
+            with unbounded_pixels():
+                image = decode_image(self.path)
+        elif self.format in self.draft_formats:
+            with unbounded_pixels():
+                image = decode_image(self.path, size)
+        else:
+            image = self.level_image(0).reduce(2 ** level)
+        if image.size != size:
+            image = image.resize(size)
+        self._levels[level] = image
+        while len(self._levels) > 2:
+            self._levels.popitem(last=False)
+        return image
+
+    def tiles_in(self, level, bbox):
+        '''The keys (level, i, j) of the tiles which intersect bbox.'''
+        width, height = self.level_size(level)
+        t = self.tile_size
+        x0, y0, x1, y1 = bbox
+        i0, j0 = max(int(x0 // t), 0), max(int(y0 // t), 0)
+        i1, j1 = min(int(x1 // t), (width-1) // t), min(int(y1 // t), (height-1) // t)
+        return [(level, i, j) for i in range(i0, i1+1) for j in range(j0, j1+1)]
+
+    def tile(self, key):
+        tile = self.cache.get(key)
+        if tile is None:
+            level, i, j = key
+            width, height = self.level_size(level)
+            t = self.tile_size
+            box = i*t, j*t, min((i+1)*t, width), min((j+1)*t, height)
+            tile = self.level_image(level).crop(box)
+            self.cache.put(key, tile, image_nbytes(tile))
+        return tile
+
+
+def visible_bbox(canvas, margin=0):
+    '''The region of the canvas shown in its window, in canvas coordinates.'''
+    x0, y0 = canvas.canvasx(0), canvas.canvasy(0)
+    x1 = canvas.canvasx(canvas.winfo_width())
+    y1 = canvas.canvasy(canvas.winfo_height())
+    return x0 - margin, y0 - margin, x1 + margin, y1 + margin
+
+
+class ImageLayer:
+    '''Show a picture on a canvas at a zoom.
+
+    At zoom 1 the whole PhotoImage is shown. Otherwise only the visible part
+    of the picture is resampled, so zooming in never builds a huge PhotoImage.
+    Call `update` when the view changes. One invisible rectangle spans the
+    whole (zoomed) picture, so `bbox('all')` covers it.
+
+    A picture decoded at a reduced resolution (see ImageLoader.display_size)
+    is decoded again from its source when zoomed in, at the next power of two
+    of the zoom (up to the original resolution), so the zoom shows the details.
+    '''
+
+    def __init__(self, canvas, image, photo=None, x=0, y=0, tags='image', source=None, **kw):
+        '''
+        :param image: The PIL picture.
+        :param photo: Its PhotoImage, created if None.
+        :param x, y: The position at zoom 1, the zoomed picture is drawn
+            from (0, 0) with anchor 'nw'.
+        :param source: The path image was decoded from, None if it is the
+            only resolution.
+        '''
+        self.canvas = canvas
+        self.image = image
+        self.source = source
+        self._source_image = None  # The source decoded for the zoom, see `detail`
+        self.photo = photo or ImageTk.PhotoImage(image)
+        self.position = x, y
+        self.tags = tags
+        self.kw = kw
+        self.zoom = 1
+        self.scale = 1  # The decoding scale is handled by ImageLoader
+        self._item = self._extent_id = None
+        self._view = None  # The last resampled region
+        self._view_photo = None
+        self.update()
+
+    @property
+    def bbox(self):
+        '''The region of the picture on the canvas, None if unknown.'''
+        width, height = self.image.size
+        if self.zoom != 1:
+            return 0, 0, width*self.zoom, height*self.zoom
+        if self.kw.get('anchor') == 'nw':
+            x, y = self.position
+            return x, y, x + width, y + height
+
+    def set_zoom(self, zoom):
+        if zoom != self.zoom:
+            self.zoom = zoom
+            if zoom <= 1:
+                self._source_image = None
+            self.clear()
+            self.update()
+
+    def detail(self):
+        '''The picture resampled by update: the source decoded at least at
+        the zoomed resolution if image was reduced from it, else image.'''
+        width, height = self.image.size
+        original_width, original_height = self.image.info.get('original_size', (width, height))
+        if self.source is None or self.zoom <= 1 or original_width <= width:
+            return self.image
+        # The power of two of the original size, the steps of a zoom reuse it
+        reduction = 2 ** max(int(log2(original_width / (width * self.zoom))), 0)
+        size = -(-original_width // reduction), -(-original_height // reduction)
+        if self._source_image is None or self._source_image.width < size[0] * 0.99:
+            self._source_image = decode_image(self.source, size)
+        return self._source_image
+
+    def update(self, *args):
+        canvas = self.canvas
+        if self.zoom == 1:
+            if self._item is None:
+                self._item = canvas.create_image(
+                    *self.position, image=self.photo, tags=self.tags, **self.kw)
+                canvas.tag_lower(self.tags)
+            return
+        zoom = self.zoom
+        width, height = self.image.size
+        if self._extent_id is None:
+            self._extent_id = canvas.create_rectangle(
+                0, 0, width*zoom, height*zoom, outline='', fill='', tags=self.tags)
+        x0, y0, x1, y1 = visible_bbox(canvas)
+        # The visible part, in picture pixels
+        box = (max(int(x0/zoom), 0), max(int(y0/zoom), 0),
+               min(int(x1/zoom) + 1, width), min(int(y1/zoom) + 1, height))
+        if box == self._view or box[0] >= box[2] or box[1] >= box[3]:
+            return
+        size = round((box[2]-box[0])*zoom), round((box[3]-box[1])*zoom)
+        image = self.detail()
+        ratio = image.width / width  # Pixels of image per pixel of self.image
+        region = tuple(round(v*ratio) for v in box)
+        resample = Image.NEAREST if zoom > ratio else Image.BILINEAR
+        view = image.crop(region).resize(size, resample)
+        self._view_photo = ImageTk.PhotoImage(view)
+        if self._item is not None:
+            canvas.delete(self._item)
+        self._item = canvas.create_image(box[0]*zoom, box[1]*zoom, anchor='nw',
+                                         image=self._view_photo, tags=self.tags)
+        canvas.tag_lower(self.tags)
+        self._view = box
+
+    def clear(self):
+        for item in (self._item, self._extent_id):
+            if item is not None:
+                self.canvas.delete(item)
+        self._item = self._extent_id = self._view = self._view_photo = None
+
+
+class TileLayer:
+    '''Show a TiledImage on a canvas, only the tiles in the visible region.
+
+    Call `update` when the view changes (scroll, resize, zoom). One invisible
+    rectangle spans the whole level, so `bbox('all')` covers the picture.
+    The zoom picks the level of the pyramid, the tiles are resampled by the
+    remaining ratio (between 0.7 and 1.4, more when zoomed in beyond
+    `TiledImage.min_level`).
+    '''
+
+    def __init__(self, canvas, tiled, level=0, tags='image', margin=1):
+        '''
+        :param canvas: A Canvas, the tiles are drawn from (0, 0).
+        :param tiled: An instance of TiledImage.
+        :param level: The level shown at zoom 1.
+        :param margin: Tiles loaded around the visible region.
+        '''
+        self.canvas = canvas
+        self.tiled = tiled
+        self.tags = tags
+        self.margin = margin
+        self.base_level = level
+        self.zoom = 1
+        self._items = {}  # key -> canvas item
+        self._photos = {}  # key -> PhotoImage of the shown tiles
+        self._extent_id = None
+        self.set_level(level)
+
+    @property
+    def scale(self):
+        '''Original pixels per canvas pixel at zoom 1.'''
+        return 2 ** self.base_level
+
+    @property
+    def ratio(self):
+        '''Canvas pixels per pixel of the current level.'''
+        return self.zoom * 2 ** (self.level - self.base_level)
+
+    @property
+    def bbox(self):
+        width, height = self.tiled.level_size(self.level)
+        return 0, 0, width*self.ratio, height*self.ratio
+
+    def set_zoom(self, zoom):
+        self.zoom = zoom
+        level = self.base_level - round(log2(zoom))
+        self.set_level(min(max(level, self.tiled.min_level), self.tiled.max_level))
+
+    def set_level(self, level):
+        self.clear()
+        self.level = level
+        width, height = self.tiled.level_size(level)
+        ratio = self.ratio
+        self._extent_id = self.canvas.create_rectangle(
+            0, 0, width*ratio, height*ratio, outline='', fill='', tags=self.tags)
+        self.update()
+
+    def update(self, *args):
+        '''Create the visible tiles, delete the others.'''
+        ratio = self.ratio
+        x0, y0, x1, y1 = visible_bbox(self.canvas, self.margin*self.tiled.tile_size*ratio)
+        wanted = set(self.tiled.tiles_in(
+            self.level, (x0/ratio, y0/ratio, x1/ratio, y1/ratio)))
+        for key in list(self._items):
+            if key not in wanted:
+                self.canvas.delete(self._items.pop(key))
+                del self._photos[key]
+        t = self.tiled.tile_size
+        for key in wanted - set(self._items):
+            _, i, j = key
+            tile = self.tiled.tile(key)
+            left, top = round(i*t*ratio), round(j*t*ratio)
+            if ratio != 1:  # Without seams between the tiles
+                right = round((i*t + tile.width) * ratio)
+                bottom = round((j*t + tile.height) * ratio)
+                tile = tile.resize((right - left, bottom - top))
+            photo = ImageTk.PhotoImage(tile)
+            self._photos[key] = photo
+            self._items[key] = self.canvas.create_image(
+                left, top, image=photo, anchor='nw', tags=self.tags)
+        self.canvas.tag_lower(self.tags)
+
+    def clear(self):
+        for item in self._items.values():
+            self.canvas.delete(item)
+        if self._extent_id is not None:
+            self.canvas.delete(self._extent_id)
+        self._items.clear()
+        self._photos.clear()
+        self._extent_id = None
+
 
 class ImageLoader:
-    def __init__(self, root):
+    def __init__(self, root, watch=False, prefetch=0, max_workers=2,
+                 cache_bytes=256*2**20, display_size=None, tile_size=None,
+                 tile_threshold=2**26, metadata_path=None,
+                 extensions=picture_extensions, recursive=True, scan_workers=8,
+                 progress=None, watch_interval=1):
+        '''Index the pictures under root once, see `refresh`.
+
+        :param root: The directory of pictures.
+        :param watch: If True, the index is rebuilt whenever the mtime of
+            a scanned directory changes (one `stat` per directory, at most
+            once per watch_interval seconds, instead of a full scan).
+        :param prefetch: Number of pictures decoded in the background on each
+            side of the current one, 0 disables the prefetching.
+        :param max_workers: The threads used by the prefetching.
+        :param cache_bytes: The memory budget of the LRU cache shared by the
+            decoded pictures and their PhotoImage.
+        :param display_size: (width, height) of the viewport, the pictures are
+            decoded at a reduced resolution to fit in it. None means full
+            resolution. See `to_image` and `to_display` for the coordinates.
+        :param tile_size: If given, the pictures with more than tile_threshold
+            pixels are shown by a TileLayer, the others by an ImageLayer.
+            See `image_layer`. Only the formats of `TiledImage.supports`
+            (JPEG) are tiled, the others are decoded whole at display_size.
+        :param metadata_path: The sidecar file of `metadata`, see MetadataIndex.
+        :param extensions, recursive, scan_workers, progress: See `find_pictures`,
+            the names are the paths relative to root ('shard/a.jpg').
+        '''
         self._root = Path(root)
+        self.watch = watch
+        self.watch_interval = watch_interval
+        self.extensions = extensions
+        self.recursive = recursive
+        self.scan_workers = scan_workers
+        self.progress = progress
+        self.cache = LRUCache(cache_bytes)
+        self._display_size = display_size
+        self._scales = {}  # path -> original width / displayed width
+        self.tile_size = tile_size
+        self.tile_threshold = tile_threshold
+        self.image_layer = None  # The layer of the current picture on the canvas
+        self.metadata_path = metadata_path
+        self._metadata = None
         self._init_params()
-        self.name_dict = {name: k for k, name in enumerate(self.names)}
+        self.refresh()
+        self.prefetcher = Prefetcher(
+            self, prefetch, max_workers) if prefetch else None
 
     def _init_params(self):
         self.current_id = 0
+        self.stride = 1  # The jump stride (with its direction) of the last move
         self._current_image = None
+        self._names = []
+        self.name_dict = {}
+        self._mtimes = {}  # directory -> mtime_ns, from the last scan
+        self._checked = 0  # When is_stale was last called by `names`
+
+    @property
+    def display_size(self):
+        return self._display_size
+
+    @display_size.setter
+    def display_size(self, size):
+        self._display_size = size
+        self.cache.clear()
+        self._scales.clear()
 
     @property
     def root(self):
@@ -19,16 +584,76 @@ class ImageLoader:
     @root.setter
     def root(self, new_root):
         self._root = Path(new_root)
+        self.refresh()
 
     def get_names(self, re_pattern):
         return set([name.parts[-1] for name in self._root.glob(re_pattern)])
 
+    def scan(self):
+        '''Walk the directory, return the sorted picture names.'''
+        names, self._mtimes = find_pictures(
+            self._root, self.extensions, self.recursive, self.scan_workers, self.progress)
+        return names
+
+    def _stat_mtimes(self):
+        mtimes = {}
+        for directory in self._mtimes:
+            try:
+                mtimes[directory] = os.stat(self._root / directory).st_mtime_ns
+            except OSError:
+                mtimes[directory] = None
+        return mtimes
+
+    def refresh(self):
+        '''Rebuild the snapshot of names and `name_dict`.'''
+        self.cache.clear()
+        self._names = self.scan()
+        self.name_dict = {name: k for k, name in enumerate(self._names)}
+        if self._metadata is not None:
+            self._update_metadata()
+
+    def is_stale(self):
+        '''Whether a directory has changed since the last `refresh`.'''
+        if not self._mtimes:  # root was missing
+            return self._root.is_dir()
+        return self._stat_mtimes() != self._mtimes
+
     @property
     def names(self):
-        png_names = self.get_names('*.png')
-        jpg_names = self.get_names('*.jpg')
-        names = png_names | jpg_names
-        return sorted(names)
+        if self.watch and time.monotonic() - self._checked > self.watch_interval:
+            self._checked = time.monotonic()
+            if self.is_stale():
+                self.refresh()
+        return self._names
+
+    @property
+    def metadata(self):
+        '''The MetadataIndex of the pictures, built on first access (only the
+        headers of the new or changed pictures are read) and kept up to date
+        by `refresh`.'''
+        if self._metadata is None:
+            self._metadata = MetadataIndex(self._root, self.metadata_path)
+            self._update_metadata()
+        return self._metadata
+
+    def _update_metadata(self):
+        stale = self.is_stale()
+        self._metadata.update(self._names)
+        if not stale:  # Writing the sidecar file is not a change of the pictures
+            self._mtimes = self._stat_mtimes()
+
+    def info(self, path):
+        '''ImageInfo(width, height, mode) of path, from `metadata` once it is
+        built, else from the header of the picture.'''
+        if self._metadata is not None:
+            name = Path(path).relative_to(self._root).as_posix()
+            if name in self._metadata:
+                return self._metadata[name]
+        return probe_header(path)
+
+    def index(self, name):
+        '''O(1) name -> index lookup.'''
+        return self.name_dict[name]
 
     def __getitem__(self, index):
         self.current_id = index
@@ -52,10 +677,13 @@ class ImageLoader:
             self.current_id -= 1
         return self[self.current_id]
 
+    def path(self, index):
+        path = self._root / self.names[index]
+        return path.as_posix()
+
     @property
     def current_path(self):
-        path = self._root / self.names[self.current_id]
-        return path.as_posix()
+        return self.path(self.current_id)
 
     @property
     def current_name(self):
@@ -64,16 +692,53 @@ class ImageLoader:
     def path2image(self, path):
         return Image.open(path)
 
+    def decode(self, path, size=None):
+        '''Decode the picture of path, see `decode_image` (thread-safe).'''
+        return decode_image(path, size)
+
     def image2tk(self, image):
         return ImageTk.PhotoImage(image)
 
     @property
     def current_image(self):
-        return Image.open(self.current_path)
+        path = self.current_path
+        image = self.cache.get(('image', path))
+        if image is None:
+            image = self.prefetcher.pop(path) if self.prefetcher else None
+            if image is None:
+                image = self.decode(path, self.display_size)
+            self.cache.put(('image', path), image, image_nbytes(image))
+            original_width = image.info.get('original_size', image.size)[0]
+            self._scales[path] = original_width / image.width
+        return image
 
     @property
     def current_image_tk(self):
-        return self.image2tk(self.current_image)
+        path = self.current_path
+        image_tk = self.cache.get(('tk', path))
+        if image_tk is None:
+            image_tk = self.image2tk(self.current_image)
+            self.cache.put(('tk', path), image_tk, image_nbytes(image_tk))
+        return image_tk
+
+    @property
+    def scale(self):
+        '''Original pixels per displayed pixel of the current picture.'''
+        return self._scales.get(self.current_path, 1)
+
+    def to_image(self, bbox):
+        '''Map the canvas coordinates to the original picture coordinates.'''
+        scale = self.scale
+        if scale == 1:
+            return bbox
+        return tuple(round(v * scale, 2) for v in bbox)
+
+    def to_display(self, bbox):
+        '''Map the original picture coordinates to the canvas coordinates.'''
+        scale = self.scale
+        if scale == 1:
+            return bbox
+        return tuple(v / scale for v in bbox)
 
     def update_image(self):
         path = self.current_path
@@ -82,9 +747,52 @@ class ImageLoader:
         else:  # Avoid loading empty picture pictures.
             self._current_image = None
 
+    def prefetch(self, first=()):
+        '''Decode the neighbours of the current picture in the background.
+
+        :param first: The indexes decoded before the neighbours, like the
+            next assignment of a WorkQueue.
+        '''
+        if self.prefetcher and not isinstance(self.current_id, slice):
+            self.prefetcher.schedule(self.current_id, self.stride, first)
+
+    def cancel_prefetch(self):
+        if self.prefetcher:
+            self.prefetcher.cancel()
+
+    def is_large(self, path):
+        width, height, _ = self.info(path)
+        return width * height > self.tile_threshold
+
+    def create_tile_layer(self, canvas):
+        path = self.current_path
+        tiled = TiledImage(path, self.tile_size)
+        level = tiled.fit_level(self.display_size) if self.display_size else tiled.min_level
+        self.image_layer = TileLayer(canvas, tiled, level)
+        self._scales[path] = self.image_layer.scale
+        self._current_image = None
+
     def create_image(self, canvas, x, y, **kw):
-        self.update_image()
-        canvas.create_image(x, y, image=self._current_image, tags='image', **kw)
+        canvas.delete('image')  # The previous picture
+        if self.image_layer:
+            self.image_layer.clear()
+            self.image_layer = None
+        path = self.current_path
+        if self.tile_size and self.is_large(path) and TiledImage.supports(path):
+            self.create_tile_layer(canvas)
+        else:
+            self.update_image()
+            # The graphs stay above the picture
+            self.image_layer = ImageLayer(canvas, self.current_image, self._current_image,
+                                          x, y, tags='image', source=self.current_path, **kw)
+        self.prefetch()
+
+    def close(self):
+        '''Stop the prefetching threads and free the cached pictures, before
+        the loader is replaced.'''
+        if self.prefetcher:
+            self.prefetcher.shutdown()
+        self.cache.clear()
 
     def __len__(self):
         return len(self.names)
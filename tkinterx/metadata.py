@@ -0,0 +1,259 @@
+'''Discover the pictures of a dataset and read their size and mode from
+their headers only.
+
+PNG (IHDR chunk) and JPEG (SOF segment) headers are parsed directly, the
+other formats fall back to `Image.open`, which also stops at the header.
+'''
+from collections import namedtuple
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from pathlib import Path
+import json
+import os
+import struct
+import threading
+import time
+from PIL import Image
+
+from .utils import save_bunch
+
+
+ImageInfo = namedtuple('ImageInfo', 'width height mode')
+
+picture_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+_png_signature = b'\x89PNG\r\n\x1a\n'
+# (color type, bit depth) -> mode, like PIL
+_png_modes = {(0, 1): '1', (0, 16): 'I;16', (2, 16): 'RGB', (3, 1): 'P',
+              (3, 2): 'P', (3, 4): 'P', (4, 16): 'LA', (6, 16): 'RGBA'}
+_png_color_modes = {0: 'L', 2: 'RGB', 3: 'P', 4: 'LA', 6: 'RGBA'}
+_jpeg_modes = {1: 'L', 3: 'RGB', 4: 'CMYK'}
+# Start Of Frame markers, 0xC4 (DHT), 0xC8 (JPG) and 0xCC (DAC) are not
+_jpeg_sof = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+             0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+_pixels_lock = threading.Lock()
+
+
+@contextmanager
+def unbounded_pixels():
+    '''Lift `Image.MAX_IMAGE_PIXELS` (the decompression bomb check of PIL)
+    inside the block, for the pictures which are large on purpose.
+
+    Example
+    ======================
+    with unbounded_pixels(), Image.open('huge.jpg') as image:
+        image.size  # (20000, 20000) instead of a DecompressionBombError
+    '''
+    with _pixels_lock:
+        limit, Image.MAX_IMAGE_PIXELS = Image.MAX_IMAGE_PIXELS, None
+        try:
+            yield
+        finally:
+            Image.MAX_IMAGE_PIXELS = limit
+
+
+def _scan_dir(path, extensions):
+    '''(mtime_ns, picture names, subdirectory paths) of one directory.'''
+    mtime = os.stat(path).st_mtime_ns  # Before listing, a later change is seen
+    names, dirs = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):  # Hidden, like the sidecar files
+                continue
+            if entry.is_dir(follow_symlinks=False):  # A link may make a cycle
+                dirs.append(entry.path)
+            elif os.path.splitext(entry.name)[1].lower() in extensions:
+                names.append(entry.name)
+    return mtime, names, dirs
+
+
+def find_pictures(root, extensions=picture_extensions, recursive=True,
+                  max_workers=8, progress=None, interval=0.1):
+    '''Find the pictures under root, each directory is listed by a thread pool.
+
+    :param extensions: The suffixes of the pictures, in lower case, the
+        match ignores the case.
+    :param recursive: If False, only the top level of root. The symbolic
+        links to directories are not followed, like `os.walk`.
+    :param progress: Called as progress(num_dirs, num_pictures) in the
+        calling thread, at most once per interval seconds and once at the end.
+    :return: (names, mtimes), the names are the paths relative to root
+        ('shard/a.jpg') sorted by their parts, mtimes maps each listed
+        directory (relative, '' for root) to its mtime_ns.
+    '''
+    root = os.fspath(root)
+    extensions = tuple(ext.lower() for ext in extensions)
+    names, mtimes = [], {}
+    last = time.perf_counter()
+    with ThreadPoolExecutor(max_workers) as executor:
+        pending = {executor.submit(_scan_dir, root, extensions): ''}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                directory = pending.pop(future)
+                try:
+                    mtimes[directory], dir_names, dirs = future.result()
+                except OSError:  # Removed or not readable, skip it
+                    continue
+                prefix = f"{directory}/" if directory else ''
+                names.extend(prefix + name for name in dir_names)
+                if recursive:
+                    for path in dirs:
+                        sub = os.path.relpath(path, root).replace(os.sep, '/')
+                        pending[executor.submit(_scan_dir, path, extensions)] = sub
+            if progress and time.perf_counter() - last > interval:
+                progress(len(mtimes), len(names))
+                last = time.perf_counter()
+    if progress:
+        progress(len(mtimes), len(names))
+    names.sort(key=lambda name: name.split('/'))
+    return names, mtimes
+
+
+def _probe_png(fp):
+    head = fp.read(26)  # Signature, length, 'IHDR', width, height, depth, color
+    if len(head) < 26 or head[12:16] != b'IHDR':
+        return None
+    width, height, depth, color = struct.unpack('>IIBB', head[16:26])
+    mode = _png_modes.get((color, depth), _png_color_modes.get(color))
+    return ImageInfo(width, height, mode)
+
+
+def _probe_jpeg(fp):
+    fp.seek(2)  # After SOI
+    while True:
+        byte = fp.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+        marker = fp.read(1)
+        while marker == b'\xff':  # Fill bytes
+            marker = fp.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            continue  # Without length
+        if marker == 0xD9 or marker == 0xDA:  # EOI, or SOS before any SOF
+            return None
+        length = fp.read(2)
+        if len(length) < 2:
+            return None
+        length, = struct.unpack('>H', length)
+        if marker in _jpeg_sof:
+            segment = fp.read(6)
+            if len(segment) < 6:
+                return None
+            _, height, width, components = struct.unpack('>BHHB', segment)
+            return ImageInfo(width, height, _jpeg_modes.get(components))
+        fp.seek(length - 2, os.SEEK_CUR)  # Skip the payload (EXIF, tables...)
+
+
+def probe_header(path):
+    '''ImageInfo(width, height, mode) of the picture of path.
+
+    Only the header is read: a few bytes for PNG, the segments before the
+    first frame for JPEG. The size of a picture above the decompression
+    bomb limit of PIL is read too.
+    '''
+    with open(path, 'rb') as fp:
+        signature = fp.read(8)
+        fp.seek(0)
+        info = None
+        if signature == _png_signature:
+            info = _probe_png(fp)
+        elif signature[:2] == b'\xff\xd8':
+            info = _probe_jpeg(fp)
+        if info is None:
+            fp.seek(0)
+            with unbounded_pixels(), Image.open(fp) as image:
+                info = ImageInfo(*image.size, image.mode)
+    return info
+
+
+class MetadataIndex(Mapping):
+    '''name -> ImageInfo of the pictures of a directory.
+
+    The headers are probed by a thread pool. The results are kept in a
+    sidecar JSON file keyed by the mtime and the size of each picture, so a
+    later `update` only calls `stat` on the unchanged pictures.
+
+    Example
+    ======================
+    index = MetadataIndex('data/pictures')
+    index.update(['a.jpg', 'b.png'])
+    index['a.jpg']  # ImageInfo(width=1920, height=1080, mode='RGB')
+    index.stats  # {'probed': 2, 'cached': 0, 'failed': 0}
+    '''
+
+    def __init__(self, root, cache_path=None, max_workers=8):
+        '''
+        :param root: The directory of the pictures, the names are relative to it.
+        :param cache_path: The sidecar file, '<root>/.metadata.json' if None.
+        :param max_workers: The threads probing the headers.
+        '''
+        self.root = Path(root)
+        self.cache_path = Path(cache_path or self.root / '.metadata.json')
+        self.max_workers = max_workers
+        self._entries = {}  # name -> [mtime_ns, size, width, height, mode]
+        self.stats = {'probed': 0, 'cached': 0, 'failed': 0}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as fp:
+                self._entries = json.load(fp)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def save(self):
+        save_bunch(self._entries, self.cache_path)
+
+    def _check(self, name):
+        '''The up-to-date entry of name, probed only if it changed.'''
+        try:
+            st = os.stat(self.root / name)
+            entry = self._entries.get(name)
+            if entry and entry[:2] == [st.st_mtime_ns, st.st_size]:
+                return entry, False
+            return [st.st_mtime_ns, st.st_size, *probe_header(self.root / name)], True
+        except (OSError, ValueError, SyntaxError):  # Missing or not a picture
+            return None, True
+
+    def update(self, names):
+        '''Index exactly names, return whether the sidecar file was rewritten.'''
+        names = list(names)
+        stats = {'probed': 0, 'cached': 0, 'failed': 0}
+        entries = {}
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            for name, (entry, probed) in zip(names, executor.map(self._check, names)):
+                if entry is None:
+                    stats['failed'] += 1
+                else:
+                    stats['probed' if probed else 'cached'] += 1
+                    entries[name] = entry
+        changed = stats['probed'] > 0 or entries.keys() != self._entries.keys()
+        self._entries = entries
+        self.stats = stats
+        if changed:
+            try:
+                self.save()
+            except OSError:  # A read-only directory, probe again next time
+                return False
+        return changed
+
+    def __getitem__(self, name):
+        return ImageInfo(*self._entries[name][2:])
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
@@ -0,0 +1,246 @@
+'''The annotation status of each picture of a store: the number of boxes,
+the histogram of the colors and the shapes, and when it was saved.
+
+The stores keep a StatusIndex up to date on each upsert, so "the next
+picture without boxes" or "the pictures with a red box" are answered by an
+SQL index instead of loading every graph.
+'''
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, namedtuple
+from collections.abc import Mapping
+import sqlite3
+import time
+
+
+Status = namedtuple('Status', 'boxes colors shapes mtime')
+
+
+def summarize(graph, mtime=None):
+    '''The Status of a graph, None for the values which are not graphs
+    (like `bunch['root']`).'''
+    if hasattr(graph, 'to_graph'):  # A BoxArray
+        graph = graph.to_graph()
+    if not isinstance(graph, Mapping):
+        return None
+    colors, shapes = Counter(), Counter()
+    for cats in graph.values():
+        color, shape = cats['tags'][:2]
+        colors[color] += 1
+        shapes[shape] += 1
+    return Status(len(graph), dict(colors), dict(shapes),
+                  time.time() if mtime is None else mtime)
+
+
+class StatusIndex:
+    '''name -> Status in two SQLite tables, written in the transactions of
+    the caller.
+
+    `status` has one row per name (`boxes` is NULL for the values which are
+    not graphs), `status_labels` one row per name and label, indexed by
+    label. `status_meta` keeps what the store needs to tell which of its
+    writes the index has seen, see `JsonLinesStore`.
+
+    Example
+    ======================
+    index = StatusIndex.open('data/annotations.jsonl.status')
+    with index.conn:
+        index.record({'a.jpg': graph})
+    index['a.jpg']  # Status(boxes=2, colors={'red': 2}, shapes={...}, mtime=...)
+    index.find(label='red')  # ['a.jpg']
+    index.find(empty=True)  # The names without boxes
+    '''
+
+    def __init__(self, conn, create=True):
+        '''
+        :param conn: An sqlite3 connection.
+        :param create: Create the tables if missing, False for a connection
+            which only reads.
+        '''
+        self.conn = conn
+        if not create:
+            return
+        conn.execute('CREATE TABLE IF NOT EXISTS status '
+                     '(name TEXT PRIMARY KEY, boxes INTEGER, mtime REAL NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS status_labels '
+                     '(name TEXT NOT NULL, category TEXT NOT NULL, label TEXT NOT NULL, '
+                     'count INTEGER NOT NULL, PRIMARY KEY (name, category, label))')
+        conn.execute('CREATE INDEX IF NOT EXISTS status_labels_label '
+                     'ON status_labels (label, name)')
+        conn.execute('CREATE TABLE IF NOT EXISTS status_meta (key TEXT PRIMARY KEY, value)')
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM status_meta WHERE key = ?',
+                                (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        self.conn.execute('INSERT OR REPLACE INTO status_meta (key, value) VALUES (?, ?)',
+                          (key, value))
+
+    @classmethod
+    def open(cls, path, create=True):
+        '''An index in its own file, committed by `with index.conn:`. The
+        file is in WAL mode, its readers never wait for a write.'''
+        conn = sqlite3.connect(str(path), check_same_thread=False)
+        if not create:
+            return cls(conn, create=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        with conn:
+            return cls(conn)
+
+    def record(self, items):
+        '''Upsert the status of the graphs of items (name -> graph).'''
+        rows, labels = [], []
+        for name, graph in items.items():
+            status = summarize(graph)
+            if status is None:
+                rows.append((name, None, time.time()))
+                continue
+            rows.append((name, status.boxes, status.mtime))
+            for category, counts in (('color', status.colors), ('shape', status.shapes)):
+                labels.extend((name, category, label, count)
+                              for label, count in counts.items())
+        self.remove(items)
+        self.conn.executemany('INSERT INTO status (name, boxes, mtime) VALUES (?, ?, ?)', rows)
+        self.conn.executemany('INSERT INTO status_labels (name, category, label, count) '
+                              'VALUES (?, ?, ?, ?)', labels)
+
+    def remove(self, names):
+        names = [(name,) for name in names]
+        self.conn.executemany('DELETE FROM status WHERE name = ?', names)
+        self.conn.executemany('DELETE FROM status_labels WHERE name = ?', names)
+
+    def __getitem__(self, name):
+        row = self.conn.execute('SELECT boxes, mtime FROM status WHERE name = ?',
+                                (name,)).fetchone()
+        if row is None or row[0] is None:
+            raise KeyError(name)
+        counts = {'color': {}, 'shape': {}}
+        for category, label, count in self.conn.execute(
+                'SELECT category, label, count FROM status_labels WHERE name = ?', (name,)):
+            counts[category][label] = count
+        return Status(row[0], counts['color'], counts['shape'], row[1])
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM status').fetchone()[0]
+
+    def find(self, label=None, empty=None):
+        '''The names of the graphs with a color or a shape label, and
+        without boxes (empty=True) or with some (empty=False).'''
+        sql, args = 'SELECT name FROM status WHERE boxes IS NOT NULL', []
+        if empty is not None:
+            sql += ' AND boxes = 0' if empty else ' AND boxes > 0'
+        if label is not None:
+            sql += ' AND name IN (SELECT name FROM status_labels WHERE label = ?)'
+            args.append(label)
+        return [name for name, in self.conn.execute(sql, args)]
+
+    def sync(self, store, changed=(), batch_size=1024):
+        '''Index again the names of changed, index the graphs of store which
+        are missing (saved before the index existed), forget the names which
+        are not in store. Only two counts when nothing changed and they agree.
+
+        :param changed: The names the store may have written without the
+            index, like the lines of a log after a crash.
+        '''
+        changed = set(changed)
+        if not changed and len(self) == len(store):
+            return
+        known = {name for name, in self.conn.execute('SELECT name FROM status')}
+        names = set(store)
+        self.remove(known - names)
+        stale = sorted((names - known) | (changed & names))
+        for start in range(0, len(stale), batch_size):
+            self.record({name: store[name] for name in stale[start:start+batch_size]})
+
+    def close(self):
+        self.conn.close()
+
+
+class StatusFilter:
+    '''A filter on the Status of the pictures, parsed from a text:
+    'unlabelled' (no box, or not annotated yet), 'labelled', or a color or
+    shape label.
+
+    Example
+    ======================
+    matches = StatusFilter('red').matches(store, loader.name_dict, len(loader))
+    matches.next(loader.current_id)  # The index of the next picture with a red box
+    '''
+
+    def __init__(self, text):
+        self.text = text.strip()
+        self.empty = self.label = None
+        if self.text in ('unlabelled', 'labelled'):
+            self.empty = self.text == 'unlabelled'
+        elif self.text:
+            self.label = self.text
+
+    def __call__(self, status):
+        '''Whether a picture of this Status (None if not annotated) matches.'''
+        if status is None:
+            return self.empty is True
+        if self.empty is not None:
+            return (status.boxes == 0) == self.empty
+        return self.label in status.colors or self.label in status.shapes
+
+    def matches(self, store, name_dict, num):
+        '''The Matches of the pictures of a loader, from the status of store.
+
+        :param name_dict: name -> index, like `ImageLoader.name_dict`.
+        :param num: The number of pictures.
+        '''
+        if self.empty:  # Also the pictures missing from the store
+            labelled = {name_dict[name] for name in store.find(empty=False)
+                        if name in name_dict}
+            return Matches(self, (i for i in range(num) if i not in labelled))
+        names = store.find(label=self.label, empty=self.empty)
+        return Matches(self, (name_dict[name] for name in names if name in name_dict))
+
+
+class Matches:
+    '''The sorted indexes of the pictures matching a StatusFilter, with
+    O(log n) navigation.'''
+
+    def __init__(self, status_filter, indexes):
+        self.filter = status_filter
+        self.indexes = sorted(indexes)
+
+    def next(self, index):
+        '''The first match after index, wrapping around, None if there is none.'''
+        if not self.indexes:
+            return None
+        k = bisect_right(self.indexes, index)
+        return self.indexes[k % len(self.indexes)]
+
+    def prev(self, index):
+        if not self.indexes:
+            return None
+        k = bisect_left(self.indexes, index)
+        return self.indexes[k - 1]
+
+    def rank(self, index):
+        '''The number of matches before index.'''
+        return bisect_left(self.indexes, index)
+
+    def update(self, index, status):
+        '''Add or drop index after its picture was saved with status.'''
+        k = bisect_left(self.indexes, index)
+        present = k < len(self.indexes) and self.indexes[k] == index
+        if self.filter(status) and not present:
+            insort(self.indexes, index)
+        elif not self.filter(status) and present:
+            del self.indexes[k]
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __contains__(self, index):
+        k = bisect_left(self.indexes, index)
+        return k < len(self.indexes) and self.indexes[k] == index
@@ -0,0 +1,737 @@
+'''Annotation storage backends with per-image upserts.
+
+A store is a mapping: image name -> graph (the `get_graph` dict), so it can
+replace the whole-file `bunch` of `utils.save_bunch`/`utils.load_bunch`.
+
+A JsonLinesStore belongs to one process. Several processes annotating the
+same project share a SQLiteStore ('*.db'), each one leasing the images it
+edits. In every store, `store[name] = None` deletes name.
+'''
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from pathlib import Path
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from .status import StatusIndex, summarize
+from .utils import load_bunch
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _to_json(obj):
+    '''A BoxArray is saved as its graph dict.'''
+    if hasattr(obj, 'to_graph'):
+        return obj.to_graph()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def _lock_file(fp):
+    '''Lock the opened file fp for this process, OSError if another one holds it.'''
+    if fcntl:
+        fcntl.flock(fp.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        msvcrt.locking(fp.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def default_owner():
+    '''The owner of the leases taken by this process: 'host:pid'.'''
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseError(Exception):
+    '''Some images are leased by other owners, they were not written.'''
+
+    def __init__(self, leases):
+        ''':param leases: image name -> owner.'''
+        self.leases = leases
+        super().__init__(', '.join(f"{name} is leased by {owner}"
+                                   for name, owner in leases.items()))
+
+
+class JsonLinesStore(MutableMapping):
+    '''An append-only log, one `[name, graph]` JSON array per line.
+
+    Each `store[name] = graph` appends one line and fsyncs it, a torn last line
+    (crash while writing) is ignored at the next opening. The latest line of
+    a name wins, `graph = null` marks a deletion. The log is compacted (rewritten
+    atomically) once the stale lines outnumber the live ones.
+
+    The index of the lines lives in memory, so the log is locked ('<path>.lock')
+    while the store is open: a second process gets an OSError instead of
+    overwriting the lines of the first one. The StatusIndex of the graphs is
+    kept in '<path>.status' with the size of the log it has seen: the lines
+    appended after it (a crash between the two writes) are indexed again at
+    the next opening.
+
+    Example
+    ======================
+    store = JsonLinesStore('data/annotations.jsonl')
+    store['a.jpg'] = {'1': {'tags': ['blue', 'rectangle'], 'bbox': [0, 0, 5, 5]}}
+    store['a.jpg']  # Only this line is read and parsed
+    store.close()
+    '''
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, path, compact_ratio=1, compact_min=1024):
+        '''
+        :param path: The path of the log, created if missing.
+        :param compact_ratio: Compact when stale lines > live lines * compact_ratio.
+        :param compact_min: Never compact a log with fewer stale lines.
+        '''
+        self.path = Path(path)
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        self.status_path = self.path.with_name(self.path.name + '.status')
+        self._generation = 0  # Of the log file, changed by `compact`
+        self._swap_lock = threading.Lock()  # Taken by compact and the readers
+        self._lock_fp = open(self.path.with_name(self.path.name + '.lock'), 'a+b')
+        try:
+            _lock_file(self._lock_fp)
+        except OSError:
+            self._lock_fp.close()
+            raise OSError(f"{self.path} is open in another process, "
+                          "share a '*.db' store instead") from None
+        self._open()
+        self.status_index = StatusIndex.open(self.status_path)
+        indexed = self.status_index.get_meta('log_size')
+        if indexed is None or indexed > self._log_size():  # New index, or compacted since
+            changed = self._index
+        else:
+            changed = [name for name, (offset, _) in self._index.items() if offset >= indexed]
+        with self.status_index.conn:
+            self.status_index.sync(self, changed)
+            self._indexed()
+
+    def _log_size(self):
+        return os.fstat(self._fp.fileno()).st_size
+
+    def _indexed(self):
+        '''Record that the status index has seen the whole log.'''
+        self.status_index.set_meta('log_size', self._log_size())
+
+    def _open(self):
+        self._generation += 1
+        self._fp = open(self.path, 'a+b')
+        self._index = {}  # name -> (offset, length)
+        self._stale = 0
+        self._fp.seek(0)
+        offset = 0
+        for line in self._fp:
+            if not line.endswith(b'\n'):  # Torn write, drop it
+                self._fp.truncate(offset)
+                break
+            # Only decode the name, the graph is parsed on demand
+            text = line.decode('utf-8')
+            name, end = self._decoder.raw_decode(text, 1)
+            if name in self._index:
+                self._stale += 1
+            if text[end:].strip() == ', null]':
+                self._index.pop(name, None)
+                self._stale += 1
+            else:
+                self._index[name] = offset, len(line)
+            offset += len(line)
+
+    def _read(self, name):
+        offset, length = self._index[name]
+        self._fp.seek(offset)
+        return self._fp.read(length)
+
+    def _append(self, lines):
+        self._fp.seek(0, os.SEEK_END)
+        offset = self._fp.tell()
+        offsets = []
+        for line in lines:
+            self._fp.write(line)
+            offsets.append((offset, len(line)))
+            offset += len(line)
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        return offsets
+
+    @staticmethod
+    def _dumps(name, graph):
+        return (json.dumps([name, graph], ensure_ascii=False,
+                           default=_to_json) + '\n').encode('utf-8')
+
+    def __getitem__(self, name):
+        return json.loads(self._read(name))[1]
+
+    def __setitem__(self, name, graph):
+        self.update({name: graph})
+
+    def update(self, other=(), **kw):
+        '''Upsert several images with a single fsync, the None graphs are
+        deletions (the `null` lines).'''
+        items = dict(other, **kw)
+        names = list(items)
+        lines = [self._dumps(name, items[name]) for name in names]
+        for name, offset in zip(names, self._append(lines)):
+            if name in self._index:
+                self._stale += 1
+            if items[name] is None:  # As read back by _open
+                self._index.pop(name, None)
+                self._stale += 1
+            else:
+                self._index[name] = offset
+        with self.status_index.conn:
+            self.status_index.record({name: graph for name, graph in items.items()
+                                      if graph is not None})
+            self.status_index.remove([name for name in names if items[name] is None])
+            self._indexed()
+        self._maybe_compact()
+
+    def __delitem__(self, name):
+        if name not in self._index:
+            raise KeyError(name)
+        self._append([self._dumps(name, None)])
+        del self._index[name]
+        self._stale += 2
+        with self.status_index.conn:
+            self.status_index.remove([name])
+            self._indexed()
+        self._maybe_compact()
+
+    def __iter__(self):
+        return iter(list(self._index))
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def _maybe_compact(self):
+        stale = self._stale
+        if stale > self.compact_min and stale > len(self._index) * self.compact_ratio:
+            self.compact()
+
+    def compact(self):
+        '''Rewrite the log with only the live lines, atomically.'''
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temp_path, 'wb') as fp:
+            for name in self._index:
+                fp.write(self._read(name))
+            fp.flush()
+            os.fsync(fp.fileno())
+        with self._swap_lock:  # The readers never see a half-built index
+            self._fp.close()
+            os.replace(temp_path, self.path)
+            self._open()
+        with self.status_index.conn:  # The graphs are the same, not their offsets
+            self._indexed()
+
+    def status(self, name):
+        '''The Status of the graph of name, None if it has none.'''
+        return self.status_index.get(name)
+
+    def find(self, label=None, empty=None):
+        '''See StatusIndex.find.'''
+        return self.status_index.find(label, empty)
+
+    def reader(self):
+        '''A reader for another thread, which never waits for the writes of
+        this store, see AsyncStore.'''
+        return _JsonLinesReader(self)
+
+    def close(self):
+        self._fp.close()
+        self.status_index.close()
+        self._lock_fp.close()  # Releases the lock
+
+
+class _JsonLinesReader:
+    '''Read the lines of a JsonLinesStore with its own file, while its
+    thread appends: the lines are flushed before they are indexed.'''
+
+    def __init__(self, store):
+        self.store = store
+        self.status_index = StatusIndex.open(store.status_path, create=False)
+        self._fp = None
+        self._generation = None  # Of the log opened by _fp
+
+    def __getitem__(self, name):
+        store = self.store
+        with store._swap_lock:
+            if self._generation != store._generation:  # Compacted since
+                if self._fp is not None:
+                    self._fp.close()
+                self._fp = open(store.path, 'rb')
+                self._generation = store._generation
+            offset, length = store._index[name]
+            self._fp.seek(offset)
+            line = self._fp.read(length)
+        return json.loads(line)[1]
+
+    def __contains__(self, name):
+        return name in self.store._index
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+        self.status_index.close()
+
+
+class SQLiteStore(MutableMapping):
+    '''A local SQLite file, one row per image, shared by several processes.
+
+    The database is in WAL mode: the readers never wait, a writer waits for
+    the other writers up to `timeout` seconds. Each `update` upserts only
+    its own images, so two processes saving different images never lose
+    each other's rows.
+
+    A process leases (`checkout`) the images it edits for `ttl` seconds and
+    renews the lease by checking them out again. The images leased by
+    another owner are not written: `update` writes the others, then raises
+    LeaseError. The leases of a crashed process expire by themselves. The
+    expiry uses the wall clock, the hosts sharing a file must agree on it.
+
+    The StatusIndex of the graphs is in the same file, written in the same
+    transactions.
+
+    Example
+    ======================
+    store = SQLiteStore('data/annotations.db')
+    if store.checkout('a.jpg', ttl=600):  # False if leased by another process
+        store['a.jpg'] = {'1': {'tags': ['blue', 'rectangle'], 'bbox': [0, 0, 5, 5]}}
+        store.release('a.jpg')
+    store.close()
+    '''
+
+    def __init__(self, path, owner=None, timeout=30, lease_timeout=0.2):
+        '''
+        :param owner: The name of the leases taken by this store,
+            `default_owner()` ('host:pid') if None.
+        :param timeout: The seconds to wait for the other writers.
+        :param lease_timeout: The same for the lease methods, which have their
+            own connection: a checkout never waits behind a long write of
+            this store, and raises sqlite3.OperationalError when the others
+            keep the file busy longer.
+        '''
+        self.path = Path(path)
+        self.owner = owner or default_owner()
+        # Used by one thread at a time, see AsyncStore. The transactions
+        # are explicit, see _transaction
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        with self._transaction():
+            self._conn.execute('CREATE TABLE IF NOT EXISTS annotations '
+                               '(name TEXT PRIMARY KEY, graph TEXT NOT NULL)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS leases '
+                               '(name TEXT PRIMARY KEY, owner TEXT NOT NULL, '
+                               'expires REAL NOT NULL)')
+            self.status_index = StatusIndex(self._conn)
+            self.status_index.sync(self)
+        self._lease_conn = sqlite3.connect(str(self.path), timeout=lease_timeout,
+                                           isolation_level=None, check_same_thread=False)
+
+    @contextmanager
+    def _transaction(self):
+        '''Take the write lock at once, so the leases read in the transaction
+        still hold when it writes.'''
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+    def _foreign_leases(self, names):
+        '''name -> owner of the names leased by another owner.'''
+        rows = self._conn.execute(
+            'SELECT name, owner FROM leases WHERE owner != ? AND expires > ?',
+            (self.owner, time.time()))
+        return {name: owner for name, owner in rows if name in names}
+
+    def checkout(self, name, ttl=600):
+        '''Lease name for ttl seconds, or renew the lease of this owner.
+
+        :return: False if another owner holds a lease on name.
+        '''
+        now = time.time()
+        cursor = self._lease_conn.execute(
+            'INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, '
+            'expires = excluded.expires '
+            'WHERE leases.owner = excluded.owner OR leases.expires <= ?',
+            (name, self.owner, now + ttl, now))
+        return cursor.rowcount > 0
+
+    def release(self, name=None):
+        '''Release the lease of name, all the leases of this owner if None.'''
+        if name is None:
+            self._lease_conn.execute('DELETE FROM leases WHERE owner = ?', (self.owner,))
+        else:
+            self._lease_conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?',
+                               (name, self.owner))
+
+    def leases(self):
+        '''name -> owner of the leases which have not expired.'''
+        rows = self._lease_conn.execute('SELECT name, owner FROM leases WHERE expires > ?',
+                                  (time.time(),))
+        return dict(rows.fetchall())
+
+    def lease_owner(self, name):
+        '''The owner of the lease on name, None if it is free.'''
+        row = self._lease_conn.execute('SELECT owner FROM leases WHERE name = ? AND expires > ?',
+                                 (name, time.time())).fetchone()
+        return row and row[0]
+
+    def __getitem__(self, name):
+        return _select_graph(self._conn, name)
+
+    def __setitem__(self, name, graph):
+        self.update({name: graph})
+
+    def update(self, other=(), **kw):
+        '''Upsert several images in one transaction, except the images
+        leased by another owner: LeaseError lists them after the others
+        are written. The None graphs are deletions.'''
+        items = dict(other, **kw)
+        with self._transaction():
+            leased = self._foreign_leases(items)
+            items = {name: graph for name, graph in items.items() if name not in leased}
+            deleted = [name for name, graph in items.items() if graph is None]
+            items = {name: graph for name, graph in items.items() if graph is not None}
+            rows = [(name, json.dumps(graph, ensure_ascii=False, default=_to_json))
+                    for name, graph in items.items()]
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO annotations (name, graph) VALUES (?, ?)', rows)
+            self._conn.executemany('DELETE FROM annotations WHERE name = ?',
+                                   [(name,) for name in deleted])
+            self.status_index.record(items)
+            self.status_index.remove(deleted)
+        if leased:
+            raise LeaseError(leased)
+
+    def __delitem__(self, name):
+        with self._transaction():
+            leased = self._foreign_leases({name})
+            if not leased:
+                cursor = self._conn.execute(
+                    'DELETE FROM annotations WHERE name = ?', (name,))
+                self.status_index.remove([name])
+        if leased:
+            raise LeaseError(leased)
+        if cursor.rowcount == 0:
+            raise KeyError(name)
+
+    def __iter__(self):
+        rows = self._conn.execute('SELECT name FROM annotations ORDER BY rowid')
+        return iter([name for name, in rows])
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM annotations').fetchone()[0]
+
+    def __contains__(self, name):
+        return _select_exists(self._conn, name)
+
+    def status(self, name):
+        '''The Status of the graph of name, None if it has none.'''
+        return self.status_index.get(name)
+
+    def find(self, label=None, empty=None):
+        '''See StatusIndex.find.'''
+        return self.status_index.find(label, empty)
+
+    def reader(self):
+        '''A reader for another thread, which never waits for the writes of
+        this store (WAL mode), see AsyncStore.'''
+        return _SQLiteReader(self.path)
+
+    def close(self):
+        '''Release the leases of this owner and close the file.'''
+        try:
+            self.release()
+        finally:
+            self._lease_conn.close()
+            self._conn.close()
+
+
+def _select_graph(conn, name):
+    row = conn.execute('SELECT graph FROM annotations WHERE name = ?', (name,)).fetchone()
+    if row is None:
+        raise KeyError(name)
+    return json.loads(row[0])
+
+
+def _select_exists(conn, name):
+    return conn.execute('SELECT 1 FROM annotations WHERE name = ?',
+                        (name,)).fetchone() is not None
+
+
+class _SQLiteReader:
+    '''Read the rows of a SQLiteStore with its own connection.'''
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        self.status_index = StatusIndex(self._conn, create=False)
+
+    def __getitem__(self, name):
+        return _select_graph(self._conn, name)
+
+    def __contains__(self, name):
+        return _select_exists(self._conn, name)
+
+    def close(self):
+        self._conn.close()
+
+
+class AsyncStore(MutableMapping):
+    '''Hand the upserts of a store to a writer thread.
+
+    `store[name] = graph` only queues the graph, the thread serializes and
+    writes the queued graphs in one `update`. A graph queued again before
+    it is written replaces the previous one. Reads see the queued graphs,
+    the others are read by the `reader` of the store, so they never wait
+    for a write.
+
+    Example
+    ======================
+    store = AsyncStore(open_store('data/annotations.jsonl'))
+    store['a.jpg'] = graph  # Returns at once
+    store['a.jpg']  # The queued graph
+    store.stats  # {'writes': 1, 'records': 1, 'last_ms': 2.5, 'lag_ms': 3.1, ...}
+    store.close()  # Writes what is left
+    '''
+
+    def __init__(self, store, retry_time=1):
+        '''
+        :param store: A JsonLinesStore or a SQLiteStore, with a `reader`.
+        :param retry_time: The seconds to wait before writing again after
+            an error, the graphs stay queued.
+        '''
+        self.store = store
+        self.retry_time = retry_time
+        self._lock = threading.Lock()  # The store is used by one thread at a time
+        self._reader = store.reader()
+        self._read_lock = threading.Lock()  # The same for the reader, never held by a write
+        self._lease_lock = threading.Lock()  # The same for the lease methods
+        self._releases = set()  # Released once their queued graph is written
+        self._cond = threading.Condition()  # Guards the queue
+        self._pending = {}  # name -> graph, not written yet
+        self._writing = {}  # name -> graph, being written
+        self._since = None  # When the oldest pending graph was queued
+        self._closed = False
+        self.stats = {'writes': 0, 'records': 0, 'last_ms': 0, 'lag_ms': 0,
+                      'pending': 0, 'error': None, 'rejected': None}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, {}
+                self._writing = batch
+                since, self._since = self._since, None
+            start = time.perf_counter()
+            rejected = None
+            try:
+                with self._lock:
+                    self.store.update(batch)
+            except LeaseError as error:  # The other graphs are written, these are dropped
+                rejected = str(error)
+            except Exception as error:  # Keep the graphs, try again later
+                with self._cond:
+                    self.stats['error'] = str(error)
+                    self._pending = {**batch, **self._pending}
+                    self._since = since
+                    self._writing = {}
+                    if self._closed:  # Given up, see close
+                        return
+                    self._cond.wait(self.retry_time)
+                continue
+            end = time.perf_counter()
+            with self._cond:
+                self._writing = {}
+                released = {name for name in self._releases if name not in self._pending}
+                self._releases -= released
+                self.stats.update(writes=self.stats['writes'] + 1,
+                                  records=self.stats['records'] + len(batch),
+                                  last_ms=(end - start) * 1000,
+                                  lag_ms=(end - since) * 1000,
+                                  pending=len(self._pending), error=None,
+                                  rejected=rejected)
+                self._cond.notify_all()
+            for name in released:
+                self._lease('release', None, name)
+
+    def __setitem__(self, name, graph):
+        with self._cond:
+            if self._closed:
+                raise ValueError('the store is closed')
+            if self._since is None:
+                self._since = time.perf_counter()
+            self._pending[name] = graph
+            self.stats['pending'] = len(self._pending)
+            self._cond.notify_all()
+
+    def __getitem__(self, name):
+        with self._cond:
+            for queue in (self._pending, self._writing):
+                if name in queue:
+                    if queue[name] is None:  # A queued deletion
+                        raise KeyError(name)
+                    return queue[name]
+        with self._read_lock:
+            return self._reader[name]
+
+    def _lease(self, method, default, *args):
+        '''Call a lease method of the store (see SQLiteStore.checkout)
+        without waiting for the writer thread.
+
+        The stores without leases, and a busy file, answer as if every
+        image was free: the writes still skip the images leased by another
+        owner (see LeaseError), and an unreleased lease expires.
+        '''
+        if not hasattr(self.store, method):
+            return default
+        try:
+            with self._lease_lock:
+                return getattr(self.store, method)(*args)
+        except sqlite3.OperationalError:  # Busy longer than lease_timeout
+            return default
+
+    def checkout(self, name, ttl=600):
+        return self._lease('checkout', True, name, ttl)
+
+    def release(self, name=None):
+        '''Release the lease of name once its queued graph is written, so
+        another process cannot take it before.'''
+        with self._cond:
+            if name in self._pending or name in self._writing:
+                self._releases.add(name)
+                return
+        self._lease('release', None, name)
+
+    def leases(self):
+        return self._lease('leases', {})
+
+    def lease_owner(self, name):
+        return self._lease('lease_owner', None, name)
+
+    def status(self, name):
+        '''The Status of the graph of name (queued or written), None if it
+        has none.'''
+        with self._cond:
+            for queue in (self._pending, self._writing):
+                if name in queue:
+                    return summarize(queue[name])
+        with self._read_lock:
+            return self._reader.status_index.get(name)
+
+    def find(self, label=None, empty=None):
+        '''See StatusIndex.find, the queued graphs included: it never waits
+        for the writer.'''
+        with self._cond:
+            queued = {**self._writing, **self._pending}
+        with self._read_lock:
+            names = self._reader.status_index.find(label, empty)
+        names = [name for name in names if name not in queued]
+        for name, graph in queued.items():
+            status = summarize(graph)
+            if status is None or (empty is not None and (status.boxes == 0) != empty):
+                continue
+            if label is None or label in status.colors or label in status.shapes:
+                names.append(name)
+        return names
+
+    def flush(self):
+        '''Block until every queued graph is written.'''
+        with self._cond:
+            while self._pending or self._writing:
+                self._cond.wait(self.retry_time)
+                if self.stats['error']:
+                    raise OSError(self.stats['error'])
+
+    def __delitem__(self, name):
+        self.flush()
+        with self._lock:
+            del self.store[name]
+
+    def __iter__(self):
+        self.flush()
+        with self._lock:
+            return iter(self.store)
+
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return len(self.store)
+
+    def __contains__(self, name):
+        with self._cond:
+            for queue in (self._pending, self._writing):
+                if name in queue:
+                    return queue[name] is not None
+        with self._read_lock:
+            return name in self._reader
+
+    def close(self):
+        '''Write the queued graphs, then close the store.'''
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._reader.close()
+        self.store.close()
+        if self._pending:
+            raise OSError(f"{len(self._pending)} graphs not written: {self.stats['error']}")
+
+
+def _import(store, legacy_path):
+    '''Copy a legacy file into store, streamed in batches: a JSON file of
+    `save_bunch` is never loaded as a whole.'''
+    if Path(legacy_path).suffix == '.jsonl':
+        legacy = JsonLinesStore(legacy_path)
+    else:
+        legacy = load_bunch(legacy_path, lazy=True)
+    try:
+        batch = {}
+        for name in legacy:
+            batch[name] = legacy[name]
+            if len(batch) == 1024:
+                store.update(batch)
+                batch = {}
+        store.update(batch)
+    finally:
+        legacy.close()
+
+
+def open_store(path, legacy_path=None, owner=None):
+    '''Open the store of path, the backend is chosen by the suffix.
+
+    :param path: '*.db', '*.sqlite' or '*.sqlite3' for SQLiteStore,
+        JsonLinesStore otherwise.
+    :param legacy_path: A JSON file written by `save_bunch` or a '*.jsonl'
+        store, or a list of them: the first one which exists is imported
+        into a new (empty) store.
+    :param owner: The owner of the leases of a SQLiteStore.
+    '''
+    if Path(path).suffix in ('.db', '.sqlite', '.sqlite3'):
+        store = SQLiteStore(path, owner)
+    else:
+        store = JsonLinesStore(path)
+    if isinstance(legacy_path, (str, os.PathLike)):
+        legacy_path = [legacy_path]
+    if legacy_path and len(store) == 0:
+        for legacy in legacy_path:
+            if Path(legacy).exists():
+                _import(store, legacy)
+                break
+    return store
@@ -1,19 +1,184 @@
 from pathlib import Path
+from collections.abc import Mapping
 import json
+import mmap
+import os
+import re
 from tkinter import ttk
 
 
 def save_bunch(bunch, path):
-    with open(path, 'w') as fp:
+    '''Write to a temporary file first, a crash never leaves a truncated file.'''
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as fp:
         json.dump(bunch, fp)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(temp_path, path)
 
 
-def load_bunch(path):
+def load_bunch(path, lazy=False):
+    '''
+    :param lazy: If True, return a LazyBunch, the values are parsed on demand.
+    '''
+    if lazy:
+        return LazyBunch(path)
     with open(path) as fp:
         bunch = json.load(fp)
     return bunch
 
 
+class LazyBunch(Mapping):
+    '''A read-only view of a JSON object file written by `save_bunch`.
+
+    The first access scans the memory-mapped file once and indexes the byte
+    span of each top-level value, `bunch[key]` then parses only that value.
+
+    Example
+    ======================
+    bunch = LazyBunch('data/annotations.json')
+    root = bunch['root']
+    cats = bunch.get('0001.jpg', {})
+    bunch.close()
+    '''
+    _decoder = json.JSONDecoder()
+    _space = re.compile(r'[ \t\n\r]*')
+    _head = re.compile(r'[ \t\n\r]*\{[ \t\n\r]*')
+    _colon = re.compile(r'[ \t\n\r]*:[ \t\n\r]*')
+    _comma = re.compile(r'[ \t\n\r]*([,}])[ \t\n\r]*')
+    _comma_array = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+
+    def __init__(self, path, window=2**22):
+        '''
+        :param window: The bytes decoded at once while scanning, it grows
+            for the values larger than it.
+        '''
+        self.path = path
+        self.window = window
+        self._fp = None
+        self._mm = None
+        self._index = None  # key -> (start, end) of the value
+
+    def _open(self):
+        self._fp = open(self.path, 'rb')
+        if os.fstat(self._fp.fileno()).st_size == 0:
+            raise ValueError(f"{self.path} is empty")
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = self._build_index()
+
+    def _read(self, start, window, end):
+        '''The text of the window at start, past the whitespace which
+        `raw_decode` rejects (a window may start right after a comma).
+
+        :return: The offset of the text in the file, and the text.
+        '''
+        while True:
+            text = self._mm[start:min(start+window, end)].decode('latin-1')
+            rel = self._space.match(text).end()
+            if rel < len(text) or start + len(text) >= end:
+                return start + rel, text[rel:]
+            start += rel
+
+    def _build_index(self):
+        '''Skip over each value with the C decoder, keep only its span.'''
+        index = {}
+        mm, size = self._mm, len(self._mm)
+        decode = self._decoder.raw_decode
+        window = self.window
+        # latin-1 maps one byte to one character: the offsets in the text are
+        # the offsets in the file, and the JSON syntax (ASCII) is preserved.
+        base, text = 0, mm[:window].decode('latin-1')
+        head = self._head.match(text)
+        if head is None:
+            raise ValueError(f"{self.path} is not a JSON object")
+        (base, text), rel = self._read(head.end(), window, size), 0
+        if text.startswith('}', rel):
+            return index
+        while True:
+            try:
+                key, key_end = decode(text, rel)
+                start = self._colon.match(text, key_end).end()
+                _, end = decode(text, start)
+                comma = self._comma.match(text, end)
+                closing = comma.group(1)
+            except (ValueError, AttributeError):
+                # The entry is cut by the window, or the JSON is invalid
+                if base + len(text) >= size:
+                    raise ValueError(f"{self.path}: invalid JSON at {base+rel}")
+                window *= 2
+                (base, text), rel = self._read(base + rel, window, size), 0
+                continue
+            if not key.isascii():  # Decode it again as UTF-8
+                key = json.loads(mm[base+rel:base+key_end])
+            index[key] = base + start, base + end
+            if closing == '}':
+                break
+            rel = comma.end()
+            if len(text) - rel < 4096 and base + len(text) < size:
+                window = self.window
+                (base, text), rel = self._read(base + rel, window, size), 0
+        return index
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._open()
+        return self._index
+
+    def __getitem__(self, key):
+        start, end = self.index[key]
+        return json.loads(self._mm[start:end])
+
+    def iter_array(self, key):
+        '''Yield the elements of the array bunch[key] one by one, for the
+        arrays too large to be parsed at once.'''
+        start, end = self.index[key]
+        mm, decode = self._mm, self._decoder.raw_decode
+        window = self.window
+        base, text = start, mm[start:min(start+window, end)].decode('latin-1')
+        head = re.compile(r'[ \t\n\r]*\[[ \t\n\r]*').match(text)
+        if head is None:
+            raise ValueError(f"{key} is not an array")
+        (base, text), rel = self._read(start + head.end(), window, end), 0
+        if text.startswith(']', rel):
+            return
+        while True:
+            try:
+                value, value_end = decode(text, rel)
+                comma = self._comma_array.match(text, value_end)
+                closing = comma.group(1)
+            except (ValueError, AttributeError):
+                if base + len(text) >= end:
+                    raise ValueError(f"{self.path}: invalid JSON at {base+rel}")
+                window *= 2
+                (base, text), rel = self._read(base + rel, window, end), 0
+                continue
+            if not text[rel:value_end].isascii():  # Decode it again as UTF-8
+                value = json.loads(mm[base+rel:base+value_end])
+            yield value
+            if closing == ']':
+                return
+            rel = comma.end()
+            if len(text) - rel < 4096 and base + len(text) < end:
+                window = self.window
+                (base, text), rel = self._read(base + rel, window, end), 0
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._fp.close()
+        self._mm = self._fp = self._index = None
+
+
 def mkdir(root_dir):
     '''依据给定名称创建目录'''
     path = Path(root_dir)
@@ -1,14 +1,162 @@
-from tkinter import ttk, Tk, StringVar, filedialog
+from tkinter import ttk, Tk, StringVar, BooleanVar, filedialog, messagebox
 from PIL import Image, ImageTk
 from pathlib import Path
 
 from .graph.canvas_design import SelectorFrame
 from .graph.canvas import Drawing, CanvasMeta
+from .graph.shapes import bunch2params
 from .utils import save_bunch, load_bunch, mkdir, FileFrame, FileNotebook
-from .image_utils import ImageLoader
+from .image_utils import ImageLoader, ImageLayer
+from .frames import open_loader
+from .status import StatusFilter, summarize
+from .store import AsyncStore, open_store
+from .work_queue import WorkQueue
+
+
+class StatusBar(ttk.Label):
+    '''Show the pointer position on a Drawing, refreshed at a fixed rate.
+
+    <Motion> only keeps the latest event, the label is refreshed at most once
+    every `interval` ms: two Tcl calls for the canvas coordinates, then the
+    readouts and one `set` if the text changed.
+
+    Example
+    ======================
+    status = StatusBar(root, drawing, interval=50)
+    status.add_readout(lambda x, y: f"zoom {drawing.zoom}")
+    status.grid()
+    '''
+
+    def __init__(self, master, drawing, interval=50, **kw):
+        '''
+        :param drawing: An instance of Drawing.
+        :param interval: The least interval (ms) between two refreshes.
+        '''
+        self.var = StringVar(master)
+        super().__init__(master, textvariable=self.var, **kw)
+        self.drawing = drawing
+        self.interval = interval
+        self.readouts = []  # function(x, y) -> str or None
+        self.stats = {'events': 0, 'refreshes': 0}
+        self._text = None
+        self._event = None
+        self._job = None
+        # The toplevel sees the motions while a button is pressed too
+        drawing.winfo_toplevel().bind('<Motion>', self.motion, add='+')
+
+    def add_readout(self, readout):
+        self.readouts.append(readout)
+
+    def set(self, text):
+        if text != self._text:
+            self._text = text
+            self.var.set(text)
+
+    def motion(self, event):
+        if event.widget is not self.drawing:
+            return
+        self.stats['events'] += 1
+        self._event = event
+        if self._job is None:
+            self._job = self.after(self.interval, self.refresh)
+
+    def refresh(self):
+        self._job = None
+        self.stats['refreshes'] += 1
+        event, self._event = self._event, None
+        if event is not None and not self.drawing.on:
+            self.drawing.update_xy(event)
+        x, y = self.drawing.x, self.drawing.y
+        texts = [f"{x:.0f}, {y:.0f}"]
+        for readout in self.readouts:
+            text = readout(x, y)
+            if text:
+                texts.append(text)
+        self.set('  |  '.join(texts))
+
+
+class AutoSaver:
+    '''Save the edits of the current picture every `interval` ms.
+
+    The picture is dirty when the history of the drawing changed since the
+    last save. Only then `save` is called, it hands a snapshot of the graphs
+    to an AsyncStore, which writes it in its thread.
+
+    Example
+    ======================
+    saver = AutoSaver(drawing, save=lambda: store.update({name: graph}),
+                      interval=5000, report=print)
+    saver.flush()  # On page change, before another picture is shown
+    saver.mark_clean()  # After loading the graphs of a picture
+    '''
+
+    def __init__(self, drawing, save, interval=5000, report=None):
+        '''
+        :param drawing: An instance of Drawing, its history tells the edits.
+        :param save: Called without argument to save the current picture.
+        :param interval: The period (ms), 0 disables the timer.
+        :param report: Called without argument after each period, to show
+            the status of the writer.
+        '''
+        self.drawing = drawing
+        self.save = save
+        self.interval = interval
+        self.report = report
+        self._saved = drawing.history.version
+        self._job = None
+        if interval:
+            self._job = drawing.after(interval, self.tick)
+
+    @property
+    def dirty(self):
+        return self.drawing.history.version != self._saved
+
+    def mark_clean(self):
+        self._saved = self.drawing.history.version
+
+    def flush(self):
+        if self.dirty:
+            self.save()
+            self.mark_clean()
+
+    def tick(self):
+        self.flush()
+        if self.report:
+            self.report()
+        self._job = self.drawing.after(self.interval, self.tick)
+
+    def cancel(self):
+        if self._job is not None:
+            self.drawing.after_cancel(self._job)
+            self._job = None
+
+
+def autosave_status(store):
+    '''The status of an AsyncStore, '' for the other stores.'''
+    if not isinstance(store, AsyncStore):
+        return ''
+    stats = store.stats
+    if stats['error']:
+        return f"Autosave failed: {stats['error']}"
+    if stats['rejected']:
+        return f"Not saved: {stats['rejected']}"
+    if stats['pending']:
+        return f"Autosave: {stats['pending']} pending"
+    if stats['writes']:
+        return f"Autosaved in {stats['lag_ms']:.0f} ms"
+    return ''
 
 
 class GraphWindow(Tk):
+    # Shared by several processes, '*.jsonl' for a store of one process
+    store_path = 'data/annotations.db'
+    # The first one which exists is imported into a new store
+    legacy_path = ('data/annotations.jsonl', 'data/annotations.json')
+    autosave_interval = 5000  # ms, 0 disables the autosave
+    # The graphs of a picture in the store, whatever saves them: a record
+    # of fewer graphs would replace the full one
+    store_tags = 'all'
+
     def __init__(self, screenName=None, baseName=None, className='Tk', useTk=1, sync=0, use=None):
         super().__init__(screenName, baseName, className, useTk, sync, use)
         self.reset()
@@ -16,11 +164,15 @@ class GraphWindow(Tk):
         self.drawing = Drawing(self, self.selector_frame,
                                width=800, height=600, background='lightgray')
         self.create_notebook()
-        self.tip_var = StringVar(self)
-        self.tip_label = ttk.Label(self, textvariable=self.tip_var,
+        self.tip_label = StatusBar(self, self.drawing,
                                    foreground='blue', background='yellow')
-        self.tip_var.set("Start your creation!")
-        self.bind('<Motion>', self.update_info)
+        self.tip_label.add_readout(self.graph_readout)
+        self.tip_label.add_readout(self.pixel_readout)
+        self.tip_label.add_readout(lambda x, y: autosave_status(self.bunch))
+        self.tip_var = self.tip_label.var
+        self.tip_label.set("Start your creation!")
+        self.autosaver = AutoSaver(self.drawing, self.autosave, self.autosave_interval)
+        self.protocol('WM_DELETE_WINDOW', self.close)
         self.bind_move()
 
     def reset(self):
@@ -29,10 +181,24 @@ class GraphWindow(Tk):
         self._image_loader = None
 
     def update_info(self, *args):
-        if not self.drawing.on:
-            self.drawing.update_xy(*args)
-        xy = self.drawing.x, self.drawing.y
-        self.tip_var.set(xy)
+        self.tip_label.refresh()
+
+    def graph_readout(self, x, y):
+        '''The graph under the pointer, from the spatial index.'''
+        graph_ids = self.drawing.model.find_at(x, y)
+        if graph_ids:
+            return ' '.join(self.drawing.model.tags(graph_ids[-1]))
+
+    def pixel_readout(self, x, y):
+        '''The value of the picture at the pointer.'''
+        layer = self.image_loader.image_layer if self.image_loader else None
+        if not isinstance(layer, ImageLayer):
+            return
+        image = layer.image
+        x0, y0 = layer.position
+        px, py = int(x / layer.zoom) - x0, int(y / layer.zoom) - y0
+        if 0 <= px < image.width and 0 <= py < image.height:
+            return f"pixel {image.getpixel((px, py))}"
 
     def bind_move(self):
         self.bind('<Up>', lambda event: self.move_graph(event, 0, -1))
@@ -42,30 +208,33 @@ class GraphWindow(Tk):
         self.bind('<F1>', self.clear_graph)
         self.bind('<F2>', self.fill_normal)
         self.bind('<Delete>', self.delete_graph)
+        self.bind('<Control-KeyPress-z>', self.drawing.undo)
+        self.bind('<Control-KeyPress-y>', self.drawing.redo)
 
     def find_closest(self):
+        '''The closest graph from the spatial index, never the picture.'''
         xy = self.drawing.x, self.drawing.y
-        graph_id = self.drawing.find_closest(*xy)
+        graph_id = self.drawing.model.nearest(*xy)
         return graph_id
 
     def find_closest_not_image(self):
-        graph_id = self.drawing.find_above('image')
-
-    def find_closest(self):
-        xy = self.drawing.x, self.drawing.y
-        graph_id = self.drawing.find_closest(*xy)
-        return graph_id
+        return self.find_closest()
 
     def delete_graph(self, *args):
         graph_id = self.find_closest()
-        self.drawing.delete(graph_id)
+        if graph_id is not None:
+            self.drawing.history.delete([graph_id])
 
     def clear_graph(self, *args):
+        # One undoable edit, then the rest (the picture)
+        self.drawing.history.delete(list(self.drawing.model))
         self.drawing.delete('all')
 
     def move_graph(self, event, x, y):
         graph_id = self.find_closest()
-        self.drawing.move(graph_id, x, y)
+        if graph_id is not None:
+            # The repeated arrow keys are undone at once
+            self.drawing.history.move([graph_id], x, y)
 
     def create_notebook(self):
         self.notebook = ttk.Notebook(
@@ -98,22 +267,22 @@ class GraphWindow(Tk):
         self.annotation_frame.load_button['command'] = self.load_graph
 
     def next_image(self):
-        self.drawing.delete('image')
-        self.image_loader.current_id += 1
-        self.image_loader.create_image(self.drawing, 0, 0, anchor='nw')
+        self.show_image(1)
 
     def prev_image(self):
+        self.show_image(-1)
+
+    def show_image(self, step):
+        self.autosaver.flush()  # The edits of the picture shown until now
         self.drawing.delete('image')
-        self.image_loader.current_id -= 1
+        self.image_loader.current_id += step
         self.image_loader.create_image(self.drawing, 0, 0, anchor='nw')
+        # The graphs (and the history) of the picture shown, never those of
+        # the previous one: the autosave would store them under this name
+        self.draw_graph(self.bunch.get(self.image_loader.current_name, {}))
 
     def get_graph(self, tags):
-        cats = {}
-        for graph_id in self.drawing.find_withtag(tags):
-            tags = self.drawing.gettags(graph_id)
-            bbox = self.drawing.bbox(graph_id)
-            cats[graph_id] = {'tags': tags, 'bbox': bbox}
-        return cats
+        return self.drawing.model.to_graph(tags)
 
     def set_path(self, tags):
         if tags == 'all':
@@ -121,20 +290,49 @@ class GraphWindow(Tk):
         else:
             return 'data/annotations.json'
 
+    def close_store(self):
+        '''Write the last edits and close the store, before self.bunch is
+        replaced.'''
+        self.autosaver.flush()
+        try:
+            if hasattr(self.bunch, 'close'):
+                self.bunch.close()
+        finally:
+            self.bunch = {}
+
+    def open_store(self):
+        self.close_store()  # The previous store
+        mkdir('data')
+        return AsyncStore(open_store(self.store_path, self.legacy_path))
+
+    def autosave(self):
+        '''Queue the graphs of the current picture, written in the background.'''
+        if isinstance(self.bunch, AsyncStore) and self.image_loader:
+            self.bunch[self.image_loader.current_name] = self.get_graph(self.store_tags)
+
+    def close(self):
+        '''Save the last edits, the window is destroyed even if they fail.'''
+        try:
+            self.close_store()
+        except OSError as error:  # The background writes failed
+            messagebox.showerror('Not saved', f"The last edits were not saved: {error}")
+        self.image_loader = None
+        self.destroy()
+
     def save_graph(self, tags):
-        graph = self.get_graph(tags)
         mkdir('data')
         path = self.set_path(tags)
         if self.image_loader:
             current_image_path = self.image_loader.current_path
             if current_image_path:
-                self.bunch.update({self.image_loader.current_name: graph})
-                save_bunch(self.bunch, path)
+                # Upsert only the current image, with all its graphs
+                self.bunch[self.image_loader.current_name] = self.get_graph(self.store_tags)
+                self.autosaver.mark_clean()
         else:
-            save_bunch(graph, path)
+            save_bunch(self.get_graph(tags), path)
 
     def load_graph(self):
-        self.bunch = load_bunch('data/annotations.json')
+        self.bunch = self.open_store()
         root = self.bunch['root']
         self.image_loader = ImageLoader(root)
         self.image_names = [
@@ -144,10 +342,11 @@ class GraphWindow(Tk):
         self.draw_graph(self.bunch[self.image_loader.current_name])
 
     def draw_graph(self, cats):
-        params = self.bunch2params(cats)
-        self.clear_graph()
-        for param in params.values():
-            self.drawing.draw_graph(**param)
+        params = bunch2params(cats)
+        self.drawing.delete('!image')  # Keep the picture
+        self.drawing.history.clear()
+        self.drawing.draw_graphs(params.values())
+        self.autosaver.mark_clean()
 
     @property
     def image_loader(self):
@@ -155,27 +354,21 @@ class GraphWindow(Tk):
 
     @image_loader.setter
     def image_loader(self, new):
+        if self._image_loader is not None and self._image_loader is not new:
+            self._image_loader.close()  # Its decoding threads
         self._image_loader = new
 
-    def bunch2params(self, bunch):
-        params = {}
-        for graph_id, cats in bunch.items():
-            tags = cats['tags']
-            color, shape = tags
-            graph_type = shape.split('_')[0]
-            bbox = cats['bbox']
-            params[graph_id] = {'tags': tags, 'color': color,
-                                'graph_type': graph_type, 'direction': bbox}
-        return params
-
     def load_normal(self):
+        self.close_store()
         self.bunch = load_bunch('data/normal.json')
         self.draw_graph(self.bunch)
 
     def fill_normal(self, *args):
         graph_id = self.find_closest()
+        if graph_id is None:
+            return
         color = self.drawing.selector_frame._selector.color
-        self.drawing.itemconfigure(graph_id, fill=color)
+        self.drawing.history.fill(graph_id, color)
 
     def create_image(self, root):
         self.image_loader = ImageLoader(root)
@@ -184,6 +377,7 @@ class GraphWindow(Tk):
     def load_images(self, *args):
         #self.image_names = filedialog.askopenfilenames(filetypes=[("All files", "*.*"), ("Save files", "*.png")])
         root = filedialog.askdirectory()
+        self.bunch = self.open_store()
         self.bunch['root'] = root
         self.create_image(root)
 
@@ -203,15 +397,93 @@ class GraphWindow(Tk):
 
 
 class ScrollableDrawing(Drawing):
+    min_zoom, max_zoom = 1/16, 32
+    lod_threshold = 3  # The graphs smaller (in screen pixels) are hidden
+
     def __init__(self, master, selector_frame, after_time=160, cnf={}, **kw):
         super().__init__(master, selector_frame, after_time, cnf, **kw)
+        self.image_layer = None  # ImageLayer or TileLayer, see `view_changed`
+        self.zoom = 1  # Canvas pixels per pixel of the displayed picture
+        self._view_job = None
+        self._region_job = None
+        # How often the scroll region is asked for and really recomputed
+        self.scroll_stats = {'requests': 0, 'updates': 0}
         self._set_scroll()
         self._scroll_command()
-        self.configure(xscrollcommand=self.scroll_x.set,
-                       yscrollcommand=self.scroll_y.set)
+        self.configure(xscrollcommand=self.xscroll,
+                       yscrollcommand=self.yscroll)
         self.bind("<Configure>", self.resize)
+        self._zoom_bind()
         self.update_idletasks()
 
+    def _zoom_bind(self):
+        # Zoom with Ctrl + wheel, pan with the middle button
+        self.bind('<Control-MouseWheel>',
+                  lambda event: self.zoom_by(1.25 if event.delta > 0 else 0.8, event.x, event.y))
+        self.bind('<Control-Button-4>', lambda event: self.zoom_by(1.25, event.x, event.y))
+        self.bind('<Control-Button-5>', lambda event: self.zoom_by(0.8, event.x, event.y))
+        self.bind('<ButtonPress-2>', lambda event: self.scan_mark(event.x, event.y))
+        self.bind('<B2-Motion>', lambda event: self.scan_dragto(event.x, event.y, gain=1))
+
+    def set_image_layer(self, layer):
+        self.image_layer = layer
+        if layer and self.zoom != 1:
+            layer.set_zoom(self.zoom)
+
+    def zoom_by(self, factor, x=0, y=0):
+        '''Zoom around the point (x, y) of the window.
+
+        The graphs are rescaled by one `scale` call, the picture layer
+        resamples only the visible region.
+        '''
+        zoom = min(max(self.zoom * factor, self.min_zoom), self.max_zoom)
+        factor = zoom / self.zoom
+        if factor == 1:
+            return
+        cx, cy = self.canvasx(x), self.canvasy(y)
+        self.zoom = zoom
+        self.scale('!image', 0, 0, factor, factor)
+        if self.image_layer:
+            self.image_layer.set_zoom(zoom)
+        region = self.update_scrollregion()
+        if region:  # Keep the point under the mouse
+            x0, y0, x1, y1 = region
+            self.xview_moveto((cx*factor - x - x0) / max(x1 - x0, 1))
+            self.yview_moveto((cy*factor - y - y0) / max(y1 - y0, 1))
+        self.update_lod()
+
+    def update_lod(self):
+        '''Hide the graphs smaller than lod_threshold pixels on the screen.'''
+        self.itemconfigure('lod', state='normal')
+        self.dtag('lod', 'lod')
+        threshold = self.lod_threshold
+        small = [graph_id for graph_id in self.model
+                 if max(self.model.extent(graph_id)) < threshold
+                 and not any('point' in tag for tag in self.model.tags(graph_id))]
+        if small:
+            self.tk.eval('\n'.join(f"{self._w} addtag lod withtag {graph_id}"
+                                   for graph_id in small))
+            self.itemconfigure('lod', state='hidden')
+
+    def xscroll(self, first, last):
+        self.scroll_x.set(first, last)
+        self.view_changed()
+
+    def yscroll(self, first, last):
+        self.scroll_y.set(first, last)
+        self.view_changed()
+
+    def view_changed(self):
+        '''Tk calls the scroll commands whenever the view changes, the
+        image layer is updated once they are all handled.'''
+        if self._view_job is None:
+            self._view_job = self.after_idle(self.update_view)
+
+    def update_view(self):
+        self._view_job = None
+        if self.image_layer:
+            self.image_layer.update()
+
     def _set_scroll(self):
         self.scroll_x = ttk.Scrollbar(self, orient='horizontal')
         self.scroll_y = ttk.Scrollbar(self, orient='vertical')
@@ -220,9 +492,30 @@ class ScrollableDrawing(Drawing):
         self.scroll_x['command'] = self.xview
         self.scroll_y['command'] = self.yview
 
-    def resize(self, event):
-        region = self.bbox('all')
-        self.configure(scrollregion=region)
+    def resize(self, event=None):
+        '''Bound to <Configure>, the scroll region is recomputed once at idle time.'''
+        self.scroll_stats['requests'] += 1
+        if self._region_job is None:
+            self._region_job = self.after_idle(self.update_scrollregion)
+
+    def update_scrollregion(self):
+        '''Union of the graph model bounds and of the picture, without a
+        full-canvas bbox scan.'''
+        if self._region_job is not None:
+            self.after_cancel(self._region_job)
+            self._region_job = None
+        self.scroll_stats['updates'] += 1
+        image_bbox = None
+        if self.image_layer:
+            image_bbox = self.image_layer.bbox
+        elif self.find_withtag('image'):
+            image_bbox = self.bbox('image')
+        regions = [region for region in (self.model.bounds(), image_bbox) if region]
+        if regions:
+            region = (min(r[0] for r in regions), min(r[1] for r in regions),
+                      max(r[2] for r in regions), max(r[3] for r in regions))
+            self.configure(scrollregion=region)
+            return region
 
     def layout(self):
         self.selector_frame.pack(side='top', anchor='w')
@@ -233,25 +526,68 @@ class ScrollableDrawing(Drawing):
 
 
 class GraphDrawing(ScrollableDrawing):
+    prefetch_num = 2  # Pictures decoded in the background on each side
+    fit_viewport = True  # Decode the pictures at the resolution of the canvas
+    tile_size = 512  # The JPEG pictures larger than tile_threshold pixels are tiled
+    tile_threshold = 2**26
+    # Shared by several processes, '*.jsonl' for a store of one process
+    store_path = 'data/annotations.db'
+    # The first one which exists is imported into a new store
+    legacy_path = ('data/annotations.jsonl', 'data/annotations.json')
+    autosave_interval = 5000  # ms, 0 disables the autosave
+    # The graphs of a picture in the store, whatever saves them: a record
+    # of fewer graphs would replace the full one
+    store_tags = 'all'
+    lease_ttl = 600  # s, the lease of the picture shown in a shared '*.db' store
+
     def __init__(self, master, selector_frame, after_time=160, cnf={}, **kw):
         super().__init__(master, selector_frame, after_time, cnf, **kw)
         self.page_var = StringVar()
         self.jump_stride_var = StringVar()
         self.jump_stride_var.set(1)
+        self.queue_var = BooleanVar(value=False)
+        self.work_queue = None  # The WorkQueue of the queue mode
+        self.filter_var = StringVar()  # See StatusFilter
+        self.match_var = StringVar()
+        self._matches = None  # The Matches of filter_var
+        self._matches_names = None  # The loader names of _matches
         self.create_notebook()
         self.image_loader = None
         self.page_num = 1
         self.info_var = StringVar()
         self.info_label = ttk.Label(
             self.selector_frame, textvariable=self.info_var)
+        self.save_var = StringVar()
+        self.save_label = ttk.Label(
+            self.selector_frame, textvariable=self.save_var)
         self.master.bind('<Return>', self.update_page)
         self.master.bind('<Control-KeyPress-s>', self.save_rectangle)
         self.master.bind('<F1>', self.clear_graph)
         self.master.bind('<Delete>', self.delete_graph)
+        self.master.bind('<Control-KeyPress-z>', self.undo)
+        self.master.bind('<Control-KeyPress-y>', self.redo)
+        self.master.bind('<F3>', self.next_match)
+        self.master.bind('<Shift-F3>', lambda event: self.next_match(direction=-1))
         #self.master.bind('<1>', self.show_current_graph)
         self.master.bind('<1>', lambda event: self.select_graph(event, 'current'))
         self.bunch = {}
+        self.leased_name = None  # The picture leased in the store
+        self.leased_by = None  # The owner of the picture shown, if not this process
         self.selected_tags = ()
+        self.autosaver = AutoSaver(self, self.autosave, self.autosave_interval,
+                                   report=self.report_autosave)
+        self.winfo_toplevel().protocol('WM_DELETE_WINDOW', self.close)
+
+    @property
+    def image_loader(self):
+        return self._image_loader
+
+    @image_loader.setter
+    def image_loader(self, new):
+        old = getattr(self, '_image_loader', None)
+        if old is not None and old is not new:
+            old.close()  # Its decoding threads
+        self._image_loader = new
 
     def show_current_graph(self, *args):
         graph_id = self.find_withtag('current')
@@ -280,23 +616,88 @@ class GraphDrawing(ScrollableDrawing):
         widgets = [[prev_button, next_button], [current_page_label, current_page_entry],
                    [jump_label, jump_entry]]
         self.notebook.layout(widgets, start=1)
+        queue_check = ttk.Checkbutton(additional_frame, text='Work queue',
+                                      variable=self.queue_var, command=self.toggle_queue)
+        filter_label = ttk.Label(additional_frame, text='filter')
+        filter_box = ttk.Combobox(additional_frame, width='10', textvariable=self.filter_var,
+                                  values=['unlabelled', 'labelled'])
+        match_button = ttk.Button(additional_frame, text='Next match', command=self.next_match)
+        match_label = ttk.Label(additional_frame, textvariable=self.match_var)
+        self.notebook.layout([[queue_check], [filter_label, filter_box],
+                              [match_button, match_label]])
         image_load_button['command'] = self.load_images
         graph_save_button['command'] = lambda: self.save_graph('all')
         graph_load_button['command'] = self.load_graph
 
-    def set_image(self):
+    def set_image(self, direction=1):
+        self.autosaver.flush()  # The edits of the picture shown until now
         self.image_loader.current_id = int(self.page_var.get())
+        self.image_loader.stride = direction * int(self.jump_stride_var.get() or 1)
+        if self.image_loader.display_size != self.viewport_size:  # Resized since
+            self.image_loader.display_size = self.viewport_size
         self.image_loader.create_image(self, 0, 0, anchor='nw')
+        self.set_image_layer(self.image_loader.image_layer)
+        # The graphs (and the history) of the picture shown, never those of
+        # the previous one: the autosave would store them under this name
+        self.reload_graph(self.bunch.get(self.image_loader.current_name, {}))
+        self.checkout_image()
+        self.report_matches()
+
+    def checkout_image(self):
+        '''Lease (or renew the lease of) the picture shown, so the other
+        processes sharing the store leave it alone. Return False if one of
+        them holds it: the picture is read only here.'''
+        name = self.image_loader.current_name
+        if name != self.leased_name:
+            self.release_image()
+        if hasattr(self.bunch, 'checkout') and not self.bunch.checkout(name, self.lease_ttl):
+            self.leased_by = self.bunch.lease_owner(name) or 'another process'
+        else:
+            self.leased_name, self.leased_by = name, None
+        self.report_autosave()
+        return self.leased_by is None
+
+    def release_image(self):
+        '''Release the lease of the picture, once its graphs are written
+        (see AsyncStore.release).'''
+        if self.leased_name is not None and hasattr(self.bunch, 'release'):
+            self.bunch.release(self.leased_name)
+        self.leased_name = None
 
     def load_images(self, *args):
         root = filedialog.askdirectory()
         if root:
-            self.image_loader = ImageLoader(root)
+            # Before the loader is replaced, the window is left as it was
+            # if the store cannot be opened
+            if not self.reopen_store():
+                return
+            self.bunch['root'] = root
+            self.image_loader = self.create_loader(root)
             self.page_num = len(self.image_loader)
             self.page_var.set(0)
             self.set_image()
             self.info_var.set(f'Total Load {self.page_num} images')
-            self.bunch['root'] = root
+
+    def create_loader(self, root):
+        return open_loader(root, prefetch=self.prefetch_num,
+                           display_size=self.viewport_size,
+                           tile_size=self.tile_size,
+                           tile_threshold=self.tile_threshold,
+                           progress=self.scan_progress)
+
+    def scan_progress(self, num_dirs, num_pictures):
+        self.info_var.set(f'Scanning: {num_pictures} images in {num_dirs} folders')
+        self.update_idletasks()
+
+    @property
+    def viewport_size(self):
+        '''The size of the canvas on the screen, the requested one until it
+        is mapped. None if the pictures are decoded at full resolution.'''
+        if not self.fit_viewport:
+            return None
+        if self.winfo_ismapped():
+            return self.winfo_width(), self.winfo_height()
+        return self.winfo_reqwidth(), self.winfo_reqheight()
 
     def get_page(self):
         return self.page_var.get(), self.jump_stride_var.get()
@@ -311,10 +712,99 @@ class GraphDrawing(ScrollableDrawing):
         if self.image_loader:
             current_page, jump_stride = self.get_page()
             if '' not in [current_page, jump_stride]:
+                # A jump makes the pending neighbours useless
+                self.image_loader.cancel_prefetch()
                 self.update_current_page(current_page)
                 self.set_image()
 
+    def toggle_queue(self):
+        '''Next takes the pictures of a WorkQueue instead of the next page.'''
+        if self.work_queue:
+            self.work_queue.close()
+            self.work_queue = None
+        if self.queue_var.get():
+            if not (self.image_loader and isinstance(self.bunch, AsyncStore)):
+                self.queue_var.set(False)
+                self.info_var.set('Load the images first')
+                return
+            self.work_queue = WorkQueue(self.bunch, self.image_loader.names, self.lease_ttl)
+            self.next_assignment()
+
+    def next_assignment(self):
+        '''Submit the current assignment, show the next one and decode the
+        one after it in the background.'''
+        queue = self.work_queue
+        name = queue.current
+        if name == self.image_loader.current_name and self.leased_by is None:
+            graph = self.image_graph('all')
+            queue.submit(name, graph)
+            self.update_matches(name, graph)
+            self.autosaver.mark_clean()  # As submitted
+            self.leased_name = None  # Released by submit
+        name = queue.take()
+        if name is None:
+            self.info_var.set('The work queue is empty')
+            return
+        self.page_var.set(self.image_loader.index(name))
+        self.set_image()
+        following = queue.peek()
+        if following is not None:
+            self.image_loader.prefetch(first=[self.image_loader.index(following)])
+        self.info_var.set(f"Assigned {name}, {queue.remaining} images left")
+
+    def matches(self):
+        '''The Matches of the filter typed in filter_var, None without a
+        filter. Rebuilt from the status index of the store when the filter
+        or the pictures change, then kept up to date by `store_graph`.'''
+        text = self.filter_var.get().strip()
+        if not (text and self.image_loader and isinstance(self.bunch, AsyncStore)):
+            return None
+        names = self.image_loader.names
+        if (self._matches is None or self._matches.filter.text != text
+                or self._matches_names is not names):
+            self._matches = StatusFilter(text).matches(
+                self.bunch, self.image_loader.name_dict, len(names))
+            self._matches_names = names
+        return self._matches
+
+    def next_match(self, *args, direction=1):
+        '''Show the next (or previous) picture matching the filter.'''
+        matches = self.matches()
+        if matches is None:
+            self.info_var.set("Type a filter: 'unlabelled', 'labelled', a color or a shape")
+            return
+        current_id = self.image_loader.current_id
+        index = matches.next(current_id) if direction > 0 else matches.prev(current_id)
+        if index is None:
+            self.info_var.set(f"No image matches '{matches.filter.text}'")
+            return
+        self.page_var.set(index)
+        self.set_image(direction)
+
+    def report_matches(self):
+        '''The rank of the picture shown among the matches, and their number.'''
+        matches = self.matches()
+        if matches is None:
+            self.match_var.set('')
+            return
+        current_id = self.image_loader.current_id
+        rank = matches.rank(current_id) + 1 if current_id in matches else '-'
+        self.match_var.set(f"{rank} / {len(matches)} pages")
+
+    def update_matches(self, name, graph):
+        if self._matches is not None and name in self.image_loader.name_dict:
+            self._matches.update(self.image_loader.index(name), summarize(graph))
+            self.report_matches()
+
+    def store_graph(self, name, graph):
+        '''Upsert the graph of one picture, and update the filtered pages.'''
+        self.bunch[name] = graph
+        self.update_matches(name, graph)
+
     def next_page(self, *args):
+        if self.work_queue:
+            self.next_assignment()
+            return
         current_page, jump_stride = self.get_page()
         if '' not in [current_page, jump_stride]:
             current_page = int(current_page) + int(jump_stride)
@@ -322,19 +812,18 @@ class GraphDrawing(ScrollableDrawing):
             self.set_image()
 
     def prev_page(self, *args):
+        if self.work_queue:
+            self.info_var.set('The work queue only goes forward, uncheck it to browse')
+            return
         current_page, jump_stride = self.get_page()
         if '' not in [current_page, jump_stride]:
             current_page = int(current_page) - int(jump_stride)
             self.update_current_page(current_page)
-            self.set_image()
+            self.set_image(direction=-1)
 
     def get_graph(self, tags):
-        cats = {}
-        for graph_id in self.find_withtag(tags):
-            tags = self.gettags(graph_id)
-            bbox = self.bbox(graph_id)
-            cats[graph_id] = {'tags': tags, 'bbox': bbox}
-        return cats
+        '''Read the graphs from the model, without any Tk call.'''
+        return self.model.to_graph(tags)
 
     def set_path(self, tags):
         if tags == 'all':
@@ -342,70 +831,137 @@ class GraphDrawing(ScrollableDrawing):
         else:
             return 'data/annotations.json'
 
-    def save_graph(self, tags):
+    def image_graph(self, tags):
+        '''The graphs of tags in the coordinates of the original picture.'''
         graph = self.get_graph(tags)
+        for cats in graph.values():
+            cats['bbox'] = self.canvas2image(cats['bbox'])
+        return graph
+
+    def save_graph(self, tags):
         mkdir('data')
         path = self.set_path(tags)
         if self.image_loader:
             current_image_path = self.image_loader.current_path
-            if current_image_path:
-                self.bunch.update({self.image_loader.current_name: graph})
-                save_bunch(self.bunch, path)
+            if current_image_path and self.checkout_image():
+                # Upsert only the current image, with all its graphs
+                self.store_graph(self.image_loader.current_name,
+                                 self.image_graph(self.store_tags))
+                self.autosaver.mark_clean()
         else:
-            save_bunch(graph, path)
+            save_bunch(self.get_graph(tags), path)
+
+    def autosave(self):
+        '''Queue the graphs of the current picture, written in the background.'''
+        if isinstance(self.bunch, AsyncStore) and self.image_loader and self.checkout_image():
+            self.store_graph(self.image_loader.current_name, self.image_graph(self.store_tags))
+
+    def report_autosave(self):
+        if self.leased_by:
+            self.save_var.set(f"Read only: leased by {self.leased_by}")
+        else:
+            self.save_var.set(autosave_status(self.bunch))
+
+    def close(self):
+        '''Save the last edits before the window is destroyed, which is
+        destroyed even if they fail.'''
+        try:
+            self.close_store()
+        except OSError as error:  # The background writes failed
+            messagebox.showerror('Not saved', f"The last edits were not saved: {error}")
+        self.image_loader = None
+        self.winfo_toplevel().destroy()
+
+    def canvas2image(self, bbox):
+        '''Canvas coordinates -> original picture coordinates.'''
+        if self.zoom != 1:
+            bbox = tuple(v / self.zoom for v in bbox)
+        return self.image_loader.to_image(bbox)
+
+    def image2canvas(self, bbox):
+        bbox = self.image_loader.to_display(bbox)
+        if self.zoom != 1:
+            bbox = tuple(v * self.zoom for v in bbox)
+        return bbox
 
     def save_rectangle(self, *args):
         self.save_graph('rectangle')
 
+    def close_store(self):
+        '''Write the last edits, give back the leases and close the store,
+        before self.bunch is replaced.'''
+        self.autosaver.flush()
+        self.release_image()
+        if self.work_queue:
+            self.queue_var.set(False)
+            self.toggle_queue()
+        self._matches = None
+        try:
+            if hasattr(self.bunch, 'close'):
+                self.bunch.close()
+        finally:
+            self.bunch = {}
+
+    def open_store(self):
+        self.close_store()  # The previous store
+        mkdir('data')
+        return AsyncStore(open_store(self.store_path, self.legacy_path))
+
+    def reopen_store(self):
+        '''Replace the store by a new one, return False and report if it is
+        in use (a '*.jsonl' store of another process).'''
+        try:
+            self.bunch = self.open_store()
+        except OSError as error:
+            self.info_var.set(f"Store in use: {error}")
+            return False
+        return True
+
     def load_graph(self):
-        self.bunch = load_bunch('data/annotations.json')
-        root = self.bunch.get()
+        if not self.reopen_store():
+            return
+        root = self.bunch.get('root')
         if root:
-            
-            self.image_loader = ImageLoader(root)
-            self.image_names = [
-                f"{root}/{image_name}" for image_name in self.bunch if image_name != root]
+            self.image_loader = self.create_loader(root)
+            self.page_num = len(self.image_loader)
+            self.page_var.set(0)
             self.image_loader.current_id = 0
-            self.create_image(root)
-            self.reload_graph(self.bunch[self.image_loader.current_name])
+            self.set_image()  # Only the record of the current image is read
         else:
-            self.bunch = load_bunch('data/normal.json')
             self.load_normal()
 
     def load_normal(self):
+        self.close_store()
         self.bunch = load_bunch('data/normal.json')
         self.reload_graph(self.bunch)
 
-    def bunch2params(self, bunch):
-        params = {}
-        for graph_id, cats in bunch.items():
-            tags = cats['tags']
-            color, shape = tags
-            graph_type = shape.split('_')[0]
-            bbox = cats['bbox']
-            params[graph_id] = {'tags': tags, 'color': color,
-                                'graph_type': graph_type, 'direction': bbox}
-        return params
-
     def reload_graph(self, cats):
-        params = self.bunch2params(cats)
-        self.clear_graph()
-        for param in params.values():
-            self.draw_graph(**param)
+        params = bunch2params(cats)
+        self.delete('!image')  # Keep the picture
+        self.history.clear()  # The edits of the previous picture
+        if self.image_loader:
+            for param in params.values():
+                param['direction'] = self.image2canvas(param['direction'])
+        self.draw_graphs(params.values())
+        self.autosaver.mark_clean()  # As in the store
+        self.info_var.set(
+            f"Drew {self.draw_stats['count']} graphs in {self.draw_stats['seconds']*1000:.1f} ms")
 
     def clear_graph(self, *args):
+        self.history.delete(list(self.model))
         self.delete('all')
-        
+
     def delete_graph(self, *args):
-        xy = self.x, self.y
-        graph_id = self.find_closest(*xy)
-        self.delete(graph_id)
+        graph_id = self.model.nearest(self.x, self.y)
+        if graph_id is not None:
+            self.history.delete([graph_id])
 
     def select_graph(self, event, tags):
         self.configure(cursor="target")
         self.update_xy(event)
         if tags == 'current':
-            self.selected_tags = self.find_withtag(tags)
+            # The graphs under the pointer, from the spatial index
+            self.selected_tags = tuple(self.model.find_at(self.x, self.y))
         else:
             self.selected_tags = tags
         print(self.selected_tags)
@@ -416,6 +972,7 @@ class GraphDrawing(ScrollableDrawing):
         self.selector_frame.info_entry.pack(side='top', anchor='w', fill='y')
         self.selector_frame._selector.pack(side='top', anchor='w', fill='y')
         self.info_label.pack(side='top', anchor='w', fill='y')
+        self.save_label.pack(side='top', anchor='w', fill='y')
         self.scroll_x.pack(side='top', fill='x')
         self.pack(side='top', expand='yes', fill='both', anchor='w')
         self.scroll_y.pack(side='left', anchor='w', fill='y')
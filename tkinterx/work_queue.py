@@ -0,0 +1,99 @@
+'''Share the pictures of a project between several annotators.
+
+The queue lives in the store itself: a picture is done once a graph with
+boxes is saved (see the StatusIndex of the store), and it is assigned while
+a process leases it (see SQLiteStore), so the processes sharing a '*.db'
+store never get the same picture.
+'''
+
+
+class WorkQueue:
+    '''Hand out the pictures not annotated yet, one at a time.
+
+    The pictures are taken in the order of names, skipping the done ones (at
+    least one box) and those leased by another process. An assignment whose process died goes
+    back to the queue when its lease expires. The next assignment is claimed
+    in advance (`peek`), so its picture can be decoded before it is needed.
+
+    Example
+    ======================
+    queue = WorkQueue(store, loader.names, ttl=600)
+    name = queue.take()  # Leased until submitted
+    queue.peek()  # The next assignment, already leased
+    queue.submit(name, drawing.image_graph('all'))
+    queue.close()  # Gives back the next assignment
+    '''
+
+    def __init__(self, store, names, ttl=600):
+        '''
+        :param store: A store with leases, a SQLiteStore or an AsyncStore of
+            one. Without leases the queue only skips the done pictures. Its
+            status index tells the done ones (`find`, `status`).
+        :param names: The picture names, like `ImageLoader.names`.
+        :param ttl: The seconds of the leases, renewed by `checkout`.
+        '''
+        self.store = store
+        self.names = names
+        self.ttl = ttl
+        # Read once from the status index, `_claim` checks the names it takes
+        self.done = set(store.find(empty=False))
+        self.current = None
+        self._next = None
+        self._position = 0  # Where the next claim starts
+
+    def _claim(self):
+        '''Lease the first picture after the last one claimed which is
+        neither done nor leased, None if there is none.'''
+        num = len(self.names)
+        leased = self.store.leases()
+        for _ in range(num):
+            name = self.names[self._position % num]
+            self._position = (self._position + 1) % num
+            if name in self.done or name in leased or name == self.current:
+                continue
+            if not self.store.checkout(name, self.ttl):  # Taken since `leases`
+                continue
+            status = self.store.status(name)
+            if status and status.boxes:  # Done by another process since __init__
+                self.done.add(name)
+                self.store.release(name)
+                continue
+            return name
+        return None
+
+    def peek(self):
+        '''The next assignment, claimed now if it was not yet.'''
+        if self._next is None:
+            self._next = self._claim()
+        return self._next
+
+    def take(self):
+        '''The next assignment, None once every picture is done or leased.
+        The current assignment, if not submitted, goes back to the queue.'''
+        if self.current is not None:
+            self._release(self.current)
+        self.current, self._next = self.peek(), None
+        return self.current
+
+    def _release(self, name):
+        self.store.release(name)  # An AsyncStore waits for the queued graph
+
+    def submit(self, name, graph):
+        '''Save the graphs of name, which is then done, and release it.'''
+        self.store[name] = graph
+        self.done.add(name)
+        self._release(name)
+        if name == self.current:
+            self.current = None
+
+    @property
+    def remaining(self):
+        '''The pictures not done, as far as this process knows.'''
+        return len(self.names) - len(self.done.intersection(self.names))
+
+    def close(self):
+        '''Give back the assignments not submitted.'''
+        for name in (self.current, self._next):
+            if name is not None:
+                self._release(name)
+        self.current = self._next = None